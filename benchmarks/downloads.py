@@ -0,0 +1,90 @@
+"""
+Benchmark of the report download scheduler against a local stand-in for Cardmarket. Run from the
+repository root:
+
+    python benchmarks/downloads.py [--reports 12] [--latency 0.5] [--rate 60] [--concurrency 1 2 4]
+
+Every POST is answered after `latency` seconds with a generated report, so the effect of
+concurrency under the same rate limit shows without touching the real site.
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.throttle import RateController, ThrottledSession  # noqa: E402
+from src.transfers import download_files  # noqa: E402
+
+
+def serve(latency, body_size):
+    """
+    Start the stand-in server in a thread, returns (server, url).
+    """
+    body = (b"OrderID;Username\n" + b"1;seller\n" * (body_size // 9))[:max(body_size, 17)]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            fields = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+            time.sleep(latency)
+            if not fields.get("idRequest"):
+                self.send_error(400)
+                return
+            # Ranges like the storage the real reports come from, so continued transfers can be tried too
+            start = int(re.match(r"bytes=(\d+)-", self.headers.get("Range", "bytes=0-")).group(1))
+            self.send_response(206 if start else 200)
+            if start:
+                self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+            self.send_header("Content-Length", str(len(body) - start))
+            self.end_headers()
+            self.wfile.write(body[start:])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/download"
+
+
+def main():
+    import requests
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds the server takes per report")
+    parser.add_argument("--size", type=int, default=200_000, help="Bytes per report")
+    parser.add_argument("--rate", type=float, default=60, help="Requests per minute")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    server, url = serve(args.latency, args.size)
+    try:
+        for concurrency in args.concurrency:
+            with tempfile.TemporaryDirectory() as directory:
+                transfers = [
+                    (os.path.join(directory, f"report-{i}.csv"), {"__cmtkn": "token", "idRequest": str(i)})
+                    for i in range(args.reports)
+                ]
+                session = ThrottledSession(requests.Session(), RateController(args.rate, jitter=0))
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results = download_files(session, url, transfers, concurrency)
+                seconds = time.perf_counter() - start
+                saved = sum(results.values())
+                intact = all(os.path.getsize(path) == os.path.getsize(transfers[0][0]) for path, _ in transfers)
+            print(f"concurrency {concurrency:<3} {seconds:8.2f} s  {saved}/{args.reports} saved  {'ok' if intact else 'size mismatch'}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark of the Downloads and Statistics page parsing. Run from the repository root:
+
+    python benchmarks/html_parsing.py [--reports 300] [--repeat 5]
+
+Fixture pages are generated in the shape of the real ones: every report is listed twice (wide
+and narrow layout) inside the site's navigation and footer. The parsing download_reports and
+generate_reports used to do is timed against src.pages, with lxml and with the html.parser
+fallback, and all of them have to find the same reports.
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup  # noqa: E402
+from src import pages  # noqa: E402
+
+NAVIGATION = "".join(
+    f'<li class="nav-item"><a class="nav-link" href="/en/Magic/Products/Singles/Set{i}">Set {i}</a></li>' for i in range(400)
+)
+FOOTER = "".join(f'<div class="footer-col"><p>Footer text {i}</p><a href="/en/Help/{i}">Help</a></div>' for i in range(100))
+
+
+def download_form(filename, id_request):
+    return (
+        f'<form method="post" action="{pages.DOWNLOAD_ACTION}" class="d-inline">'
+        f'<input type="hidden" name="__cmtkn" value="token{id_request}">'
+        f'<input type="hidden" name="idRequest" value="{id_request}">'
+        f'<button type="submit" class="btn btn-link p-0"><span class="fonticon-download"></span> {filename}</button></form>'
+    )
+
+
+def downloads_page(reports):
+    rows = []
+    for i in range(reports):
+        year, month = 2015 + i // 12, i % 12 + 1
+        filename = f"mkm-purchases-byPurchaseDate-{year}-{month:02d}-{100000 + i}.csv"
+        form = download_form(filename, 500000 + i)
+        rows.append(
+            f'<div class="row article-row"><div class="col-md-6 d-none d-md-flex">{form}</div>'
+            f'<div class="col-12 d-md-none">{form}</div><div class="col">{year}-{month:02d}-28 12:00</div></div>'
+        )
+    return f'<html><head><title>Downloads</title></head><body><nav><ul>{NAVIGATION}</ul></nav><main>{"".join(rows)}</main><footer>{FOOTER}</footer></body></html>'
+
+
+def statistics_page():
+    months = "".join(f'<option value="{m}">Month {m}</option>' for m in range(1, 13))
+    years = "".join(f'<option value="{y}">{y}</option>' for y in range(2010, 2027))
+    form = (
+        '<form method="post" action="/en/Magic/PostGetAction/Reports_Asynchronous_GetMonthlyPurchaseSummary">'
+        '<input type="hidden" name="__cmtkn" value="token"><input type="hidden" name="idUser" value="42">'
+        '<input type="hidden" name="priceForBuyer" value="1">'
+        f'<select name="month">{months}</select><select name="year">{years}</select></form>'
+    )
+    tables = "".join(f'<table><tr><td>{i}</td><td>{i * 3}</td></tr></table>' for i in range(300))
+    return f'<html><body><nav><ul>{NAVIGATION}</ul></nav><main>{form}{tables}</main><footer>{FOOTER}</footer></body></html>'
+
+
+def old_downloads(html):
+    # The parsing download_reports did before src.pages
+    soup = BeautifulSoup(html, "html.parser")
+    rows = soup.find_all("form", action=pages.DOWNLOAD_ACTION)
+    rows = list({str(row): row for row in rows}.values())
+    return [
+        (row.find("button").text.strip(), row.find("input", {"name": "idRequest"})["value"])
+        for row in rows
+    ]
+
+
+def old_report_form(html):
+    # The parsing generate_reports did before src.pages
+    soup = BeautifulSoup(html, 'html.parser')
+    return (
+        soup.find("input", {"name": "__cmtkn"})["value"],
+        soup.find("input", {"name": "idUser"})["value"],
+        soup.find("input", {"name": "priceForBuyer"})["value"],
+        {option['value']: option.text for option in soup.select('select[name="year"] option')},
+        {option['value']: option.text for option in soup.select('select[name="month"] option')},
+    )
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    downloads_html, statistics_html = downloads_page(args.reports), statistics_page()
+    lxml = pages.lxml
+    variants = [("html.parser, before", None), ("src.pages, html.parser", False)]
+    if lxml:
+        variants.append(("src.pages, lxml", True))
+
+    expected_downloads, expected_form = old_downloads(downloads_html), old_report_form(statistics_html)
+    for name, use_lxml in variants:
+        if use_lxml is None:
+            downloads_time, downloads = best_of(lambda: old_downloads(downloads_html), args.repeat)
+            form_time, form = best_of(lambda: old_report_form(statistics_html), args.repeat)
+        else:
+            pages.lxml = lxml if use_lxml else None
+            downloads_time, entries = best_of(lambda: pages.parse_downloads(downloads_html), args.repeat)
+            form_time, form = best_of(lambda: pages.parse_report_form(statistics_html), args.repeat)
+            downloads = [(entry.filename, entry.id_request) for entry in entries]
+            form = (form.token, form.id_user, form.price_for_buyer, form.years, form.months)
+        same = downloads == expected_downloads and form == expected_form
+        print(f"{name:<24} downloads {downloads_time * 1000:8.2f} ms  statistics {form_time * 1000:8.2f} ms  {'ok' if same else 'DIFFERENT'}")
+    pages.lxml = lxml
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Import-time benchmark for the CLI startup path. Run from the repository root:
+
+    python benchmarks/import_time.py [budget_ms]
+
+Runs mkm.py under -X importtime for the commands that should start instantly and fails
+when one of them imports a heavy module or spends more than the budget on imports.
+"""
+import os
+import subprocess
+import sys
+
+MKM = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mkm.py")
+
+# Commands that must not pay for the search/download stack
+COMMANDS = [
+    ["--version"],
+    ["--help"],
+    ["search", "--help"],
+    ["shell", "--help"],
+    ["download", "--help"],
+    ["generate-reports", "--help"],
+    ["sync", "--help"],
+]
+
+HEAVY_MODULES = {"pandas", "numpy", "pyarrow", "rich", "bs4", "cloudscraper"}
+
+# Interpreter start up, not something mkm can change
+STARTUP_MODULES = {"site", "encodings", "_frozen_importlib_external", "zipimport"}
+
+DEFAULT_BUDGET_MS = 100.0
+RUNS = 5
+
+
+def import_times(args):
+    """
+    Run mkm.py with args under -X importtime. Returns the import time in ms spent outside
+    interpreter start up, and the top level packages of every imported module.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", MKM, *args],
+        capture_output=True, text=True,
+    )
+    total, packages = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # The header line
+        packages.add(name.strip().split(".")[0])
+        # Only top level entries, nested ones are already part of their cumulative time
+        if not name[1:].startswith(" ") and name.strip() not in STARTUP_MODULES:
+            total += int(cumulative)
+    return total / 1000, packages
+
+
+def main(budget_ms=DEFAULT_BUDGET_MS):
+    failed = False
+    for args in COMMANDS:
+        # Best of a few runs, the first one also pays for a cold disk cache
+        runs = [import_times(args) for _ in range(RUNS)]
+        total = min(run[0] for run in runs)
+
+        heavy = sorted(HEAVY_MODULES & set().union(*(run[1] for run in runs)))
+        status = "ok"
+        if heavy:
+            status = f"FAIL imports {', '.join(heavy)}"
+        elif total > budget_ms:
+            status = f"FAIL over budget of {budget_ms:.0f} ms"
+        failed = failed or status != "ok"
+        print(f"{'mkm ' + ' '.join(args):<28} {total:8.1f} ms  {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS))
@@ -0,0 +1,179 @@
+"""
+Benchmark of the search pipeline on synthetic reports: ingest, filter, sort and render.
+Run from the repository root:
+
+    python benchmarks/pipeline.py [--months 60] [--orders 200] [--repeat 5] [--output results.json]
+    python benchmarks/pipeline.py --compare before.json after.json
+
+Reports are generated into a temporary csv_files, every scenario is timed a few times and
+the results are written as JSON so runs on different commits can be compared.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import generate  # noqa: E402
+
+
+def timed(function, repeat, setup=None):
+    """
+    Run function `repeat` times, with setup before every run outside the timing.
+    Returns the timings and the last result.
+    """
+    timings, result = [], None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def scenarios(repeat):
+    """
+    Yield (name, timings, rows) for every scenario, run inside a directory holding csv_files.
+    """
+    from src import search as mkm_search
+
+    def clear_cache():
+        shutil.rmtree(os.path.join("csv_files", ".cache"), ignore_errors=True)
+
+    timings, df = timed(mkm_search.get_dataframe, max(1, repeat // 2), setup=clear_cache)
+    yield "cold_load", timings, len(df)
+    timings, df = timed(mkm_search.get_dataframe, repeat)
+    yield "warm_load", timings, len(df)
+    timings, recent = timed(lambda: mkm_search.get_dataframe(date_of_purchase=">2019-06-01"), repeat)
+    yield "warm_load_recent_months", timings, len(recent)
+
+    filters = {
+        "filter_product_name": [{mkm_search.product_name_column: "bolt"}],
+        "filter_product_regex": [{mkm_search.product_name_column: "^(?:sol|dark) r"}],
+        "filter_set_name": [{mkm_search.set_name_column: "horizons"}],
+        "filter_user_name": [{mkm_search.user_name_column: "seller01"}],
+        "filter_date": [{mkm_search.date_of_purchase_column: "2016-01-01 to 2016-12-31"}],
+        "filter_foil": [{mkm_search.foiliness_column: mkm_search.foil_marker}],
+        "filter_combined": [
+            {mkm_search.foiliness_column: mkm_search.foil_marker},
+            {mkm_search.set_name_column: "Modern Horizons"},
+            {mkm_search.user_name_column: "seller0"},
+        ],
+    }
+    for name, columns in filters.items():
+        timings, result = timed(lambda: mkm_search.filter_data(df, columns), repeat)
+        yield name, timings, len(result)
+
+    # The same filters answered from a RowIndex, built once like the persisted one
+    from src.bitmaps import RowIndex
+    timings, index = timed(lambda: RowIndex.build(df), max(1, repeat // 2))
+    yield "row_index_build", timings, index.length
+    for name in ["filter_user_name", "filter_foil", "filter_combined"]:
+        timings, result = timed(lambda: mkm_search.filter_data(df, filters[name], index), repeat)
+        yield name + "_row_index", timings, len(result)
+    # A shell keeps its frame in one piece per column, which makes taking the rows cheap
+    timings, warm = timed(lambda: mkm_search.rechunk(df), max(1, repeat // 2))
+    yield "rechunk", timings, len(warm)
+    timings, result = timed(lambda: mkm_search.filter_data(warm, filters["filter_combined"], index), repeat)
+    yield "filter_combined_row_index_rechunked", timings, len(result)
+
+    for column in [mkm_search.product_name_column, "Price"]:
+        timings, result = timed(lambda: mkm_search.top_k(df, column, False, 101), repeat)
+        yield f"sort_top_k_{column.lower().replace(' ', '_')}", timings, len(result)
+        timings, result = timed(lambda: df.sort_values(column, ascending=False), repeat)
+        yield f"sort_full_{column.lower().replace(' ', '_')}", timings, len(result)
+
+    shown = df.head(1000)[[mkm_search.product_name_column, mkm_search.set_name_column, mkm_search.quantity_column, "Price"]]
+    with contextlib.redirect_stdout(io.StringIO()):
+        timings, _ = timed(lambda: mkm_search.formatted_output(shown, False, 1000, ""), repeat)
+    yield "render_1000_rows", timings, len(shown)
+
+    arguments = ("bolt", None, None, None, False, "Product Name", False, "2", 100)
+    with contextlib.redirect_stdout(io.StringIO()):
+        timings, _ = timed(lambda: mkm_search.search(*arguments), repeat)
+    yield "search_end_to_end", timings, None
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(months, orders, repeat, seed):
+    import pandas as pd
+    results = {}
+    directory = tempfile.mkdtemp(prefix="mkm-benchmark-")
+    previous = os.getcwd()
+    try:
+        generate(os.path.join(directory, "csv_files"), months, orders, seed)
+        os.chdir(directory)
+        for name, timings, rows in scenarios(repeat):
+            results[name] = {"min": min(timings), "median": statistics.median(timings), "rows": rows}
+            print(f"{name:<32} {min(timings) * 1000:10.2f} ms  {'' if rows is None else rows}")
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "parameters": {"months": months, "orders": orders, "repeat": repeat, "seed": seed},
+        "results": results,
+    }
+
+
+def compare(before_path, after_path):
+    with open(before_path, "r", encoding="utf-8") as file:
+        before = json.load(file)
+    with open(after_path, "r", encoding="utf-8") as file:
+        after = json.load(file)
+    if before["parameters"] != after["parameters"]:
+        print("Warning: the runs used different parameters")
+
+    print(f"{'scenario':<32} {before['commit'] or 'before':>12} {after['commit'] or 'after':>12}  change")
+    for name, result in after["results"].items():
+        if name not in before["results"]:
+            continue
+        old, new = before["results"][name]["min"], result["min"]
+        print(f"{name:<32} {old * 1000:10.2f}ms {new * 1000:10.2f}ms  {new / old:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=60)
+    parser.add_argument("--orders", type=int, default=200, help="Orders per month")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args.months, args.orders, args.repeat, args.seed)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
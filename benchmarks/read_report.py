@@ -0,0 +1,67 @@
+"""
+Benchmark of how read_report puts parsed products and order fields together. Run from the repository root:
+
+    python benchmarks/read_report.py [--months 24] [--orders 200] [--repeat 5] [--seed 1]
+
+read_report used to set a MultiIndex on the products, drop duplicate orders and merge the order
+fields back on by OrderID. It now takes them by position. Both are timed on the same synthetic
+reports; tests/test_read_report.py checks that they give the same frame.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd  # noqa: E402
+from benchmarks.synthetic import generate  # noqa: E402
+from src import search as mkm_search  # noqa: E402
+from src.columns import date_of_purchase_column, order_id_column, original_header, product_field  # noqa: E402
+
+
+def old_read_report(file_path):
+    # The assembly read_report did before the order fields were taken by position, reading is shared
+    combined_df = mkm_search.read_report_csv(file_path)
+    combined_df[date_of_purchase_column] = pd.to_datetime(combined_df[date_of_purchase_column]).dt.normalize()
+    if combined_df.empty:
+        return mkm_search.empty_report()
+
+    products_df = mkm_search.parse_products_batch(combined_df[product_field], combined_df["Currency"])
+    products_df[order_id_column] = combined_df[order_id_column].loc[products_df.index].to_numpy()
+    products_df = products_df.reset_index(drop=True)
+    products_df = products_df.set_index([order_id_column, products_df.groupby(order_id_column).cumcount()])
+    merged_df = combined_df[original_header].drop_duplicates()
+    final_df = pd.merge(products_df, merged_df, on=order_id_column, how='left')
+    return final_df.sort_values(date_of_purchase_column, kind="stable", ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="mkm-benchmark-")
+    try:
+        reports = generate(directory, args.months, args.orders, args.seed)
+        timings, rows = {"before": [], "after": []}, 0
+        for _ in range(args.repeat):
+            for name, read in (("before", old_read_report), ("after", mkm_search.read_report)):
+                start = time.perf_counter()
+                rows = sum(len(read(report)) for report in reports)
+                timings[name].append(time.perf_counter() - start)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for name, values in timings.items():
+        print(f"{name:<8} {min(values) * 1000:10.2f} ms  {rows} rows from {len(reports)} reports")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Generator of Cardmarket style purchase reports for the benchmarks.
+
+    python benchmarks/synthetic.py <directory> [months] [orders_per_month] [seed]
+
+Writes one ";" separated report per month, named like the downloaded ones so month
+pruning applies. Descriptions mix singles, foils, tokens with nested parentheses,
+sealed products and accessories, in several currencies.
+"""
+import os
+import random
+import sys
+
+HEADER = (
+    "OrderID;Username;Name;Street;City;Country;Is Professional;VAT Number;Date of Purchase;"
+    "Article Count;Merchandise Value;Shipment Costs;Trustee service fee;Total Value;Currency;"
+    "Description;Product ID;Localized Product Name"
+)
+
+CARDS = [
+    "Lightning Bolt", "Cabal Therapy", "Myth Realized", "Sol Ring", "Counterspell", "Rad Counter",
+    "Ponder", "Brainstorm", "Dark Ritual", "Swords to Plowshares", "Thoughtseize", "Fatal Push",
+    "Ragavan, Nimble Pilferer", "Urza's Saga", "Force of Will", "Snapcaster Mage", "Tarmogoyf",
+    "Emry, Lurker of the Loch", "Jace, the Mind Sculptor", "Liliana of the Veil",
+]
+SETS = [
+    "Dragons of Tarkir", "Premium Deck Series: Graveborn", "Magic 2010", "Commander Legends",
+    "Magic: The Gathering | Universes Beyond: Fallout", "Modern Horizons 3", "Lorwyn", "Ice Age",
+    "Throne of Eldraine", "Commander 2014", "Dominaria United", "Murders at Karlov Manor",
+]
+TOKENS = [
+    "Beast Token (G 3/3) / Elemental Token (G 5/3)", "Treasure Token", "Soldier Token (W 1/1)",
+    "Zombie Token (B 2/2) / Spirit Token (W 1/1)",
+]
+SEALED = ["Booster Box", "Collector Booster", "Bundle", "Prerelease Pack"]
+ACCESSORIES = ["80 KMC Hyper mat Sleeves (Black)", "Ultimate Guard Boulder 100+ (Blue)", "Dragon Shield Matte (Jet)"]
+RARITIES = ["Common", "Uncommon", "Rare", "Mythic"]
+CONDITIONS = ["MT", "NM", "EX", "GD", "LP", "PL", "PO"]
+LANGUAGES = ["English", "English", "English", "German", "French", "Japanese", "Simplified Chinese", "Italian"]
+COUNTRIES = ["Germany", "France", "Italy", "Spain", "Netherlands", "Austria", "Belgium"]
+CURRENCIES = ["EUR", "EUR", "EUR", "GBP", "CHF"]
+
+
+def money(value):
+    return f"{value:.2f}".replace(".", ",")
+
+
+def product_line(rng, currency):
+    kind = rng.random()
+    quantity = rng.choice([1, 1, 1, 2, 3, 4])
+    price = money(rng.uniform(0.05, 40))
+    if kind < 0.7:
+        foil = " - Foil" if rng.random() < 0.2 else ""
+        number = f" - {rng.randint(1, 350)}" if rng.random() < 0.5 else ""
+        return (
+            f"{quantity}x {rng.choice(CARDS)} ({rng.choice(SETS)}){number} - {rng.choice(RARITIES)} - "
+            f"{rng.choice(CONDITIONS)} - {rng.choice(LANGUAGES)}{foil} - {price} {currency}"
+        )
+    if kind < 0.82:
+        return (
+            f"{rng.choice([1, 5, 10])}x {rng.choice(TOKENS)} ({rng.choice(SETS)}) - T {rng.randint(1, 20)}/21 - Token - "
+            f"{rng.choice(CONDITIONS)} - {rng.choice(LANGUAGES)} - {money(rng.uniform(0.02, 1))} {currency}"
+        )
+    if kind < 0.92:
+        set_name = rng.choice(SETS)
+        return f"1x {rng.choice(SEALED)} | {set_name} ({set_name}) - {rng.choice(LANGUAGES)} - {money(rng.uniform(5, 300))} {currency}"
+    return f"{quantity}x {rng.choice(ACCESSORIES)} - {rng.choice(LANGUAGES)} - {price} {currency}"
+
+
+def generate(directory, months=24, orders_per_month=100, seed=1, first_year=2015):
+    """
+    Write the reports and return their paths. The same arguments always give the same files.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    sellers = [f"seller{i:03d}" for i in range(max(10, orders_per_month // 3))]
+    order_id = 100000000
+    paths = []
+    for index in range(months):
+        year, month = first_year + index // 12, index % 12 + 1
+        path = os.path.join(directory, f"mkm-purchases-byPurchaseDate-{year}-{month:02d}.csv")
+        lines = [HEADER]
+        for _ in range(orders_per_month):
+            order_id += rng.randint(1, 500)
+            currency = rng.choice(CURRENCIES)
+            products = [product_line(rng, currency) for _ in range(rng.choice([1, 1, 2, 3, 5, 8, 15]))]
+            merchandise = rng.uniform(1, 200)
+            shipping = rng.choice([1.15, 1.5, 2.3, 5.9])
+            lines.append(";".join([
+                str(order_id), rng.choice(sellers), "Jane Doe", "Main Street 1", "12345 Town", rng.choice(COUNTRIES),
+                "", "", f"{year}-{month:02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00",
+                str(len(products)), money(merchandise), money(shipping), money(0.1), money(merchandise + shipping),
+                currency, " | ".join(products), " | ".join(str(rng.randint(1000, 999999)) for _ in products), "",
+            ]))
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    arguments = [int(value) for value in sys.argv[2:5]]
+    print(f"Wrote {len(generate(sys.argv[1], *arguments))} reports to {sys.argv[1]}")
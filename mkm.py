@@ -17,24 +17,37 @@ class CustomHelpCommandGroup(TyperGroup):
             args[args.index("-h")] = "--help"
         super().parse_args(ctx, args)
 
-app = typer.Typer(cls=CustomHelpCommandGroup, add_completion=False)
+# Plain click help keeps rich (and its import time) out of --help
+app = typer.Typer(cls=CustomHelpCommandGroup, add_completion=False, rich_markup_mode=None)
 
 @app.command()
 def download(
     year: int = typer.Option(None, "-y", "--year", help="The year of the report to download"),
-    month: int = typer.Option(None, "-m", "--month", help="The month of the report to download")
+    month: int = typer.Option(None, "-m", "--month", help="The month of the report to download"),
+    concurrency: int = typer.Option(2, "-n", "--concurrency", help="Number of reports downloaded at the same time"),
+    rate: float = typer.Option(6.0, "-r", "--rate", help="Most requests started per minute, shared by all concurrent downloads")
 ):
     """
     Downloads all reports that have been generated, doesn't download them again by cheching what has been downloaded. Specify year and month to redownload 1 report.
     """
     from src.downloads import download_reports
-    download_reports(year, month)
+    download_reports(year, month, concurrency, rate)
 
-from src.search import set_name_column, product_name_column, quantity_column, total_price_column, date_of_purchase_column, quality_column, foiliness_column
+from src.columns import product_name_column, quantity_column, quality_column, foiliness_column
 default_columns = f"{product_name_column},{quantity_column},{quality_column},{foiliness_column}"
 
 display_columns_help = f"Presets: 1-5, where 1 is default. You can also customize what to show. Wrap the column names in \"quotations\". "
 date_of_purchase_help= 'The date of purchase as "YYYY-MM-DD". Prefix with ">" or "<" or type "YYYY-MM-DD to YYYY-MM-DD".'
+jobs_help = "Number of processes used to parse new or changed reports, 0 uses one per CPU."
+queries_help = "File with one product name per line, or - for stdin. Prints one JSON line per name with hits, quantity and last purchase date."
+compact_help = "Keep the orders in a compact layout that uses less memory, mostly useful with large histories."
+profile_help = "Print the time, rows and peak memory of every search stage. Memory tracing slows the search down, compare times between profiled runs only."
+profile_output_help = "With --profile, also write a Chrome trace (a .json file) or cProfile statistics for pstats (any other file)."
+format_help = "Output format: table, or tsv, csv, jsonl or parquet to write the results for other tools. Parquet has to be redirected to a file."
+pager_help = "Browse the results page by page, --limit rows per page. Sorting again doesn't search again."
+fuzzy_help = "Match product and set names by similarity, so typos like \"Cabal Therpy\" still find them. Only the closest names are searched for."
+explain_help = "Print how the filters were run: their order, method, estimated and actual rows and time."
+engine_help = "Query engine, \"pandas\" or \"sqlite\". The sqlite engine keeps an indexed database in csv_files/.cache."
 @app.command()
 def search(
     product_name: str = typer.Option(None, "-p", "--product-name", help="The name of the product to search for."),
@@ -45,13 +58,42 @@ def search(
     sort_by: str = typer.Option("Product Name", "-sb", "--sort-by", help="Column name to sort by (e.g., 'Product Name', 'Price')."),
     sort_order: bool = typer.Option(False, "-asc", "--ascending", help="Use this option to sort in ascending order."),
     display_columns: str = typer.Option(default_columns, "-dc", "--display-columns", help=display_columns_help),
-    limit: int = typer.Option(100, "-l", "--limit", help="Limit the number of rows displayed in the results.")
+    limit: int = typer.Option(100, "-l", "--limit", help="Limit the number of rows displayed in the results."),
+    jobs: int = typer.Option(1, "-j", "--jobs", help=jobs_help),
+    engine: str = typer.Option("pandas", "-e", "--engine", help=engine_help),
+    queries: str = typer.Option(None, "-q", "--queries", help=queries_help),
+    compact: bool = typer.Option(False, "-c", "--compact", help=compact_help),
+    output_format: str = typer.Option("table", "--format", help=format_help),
+    pager: bool = typer.Option(False, "-pg", "--pager", help=pager_help),
+    fuzzy: bool = typer.Option(False, "-z", "--fuzzy", help=fuzzy_help),
+    explain: bool = typer.Option(False, "--explain", help=explain_help),
+    profile: bool = typer.Option(False, "--profile", envvar="MKM_PROFILE", help=profile_help),
+    profile_output: str = typer.Option(None, "--profile-output", envvar="MKM_PROFILE_OUTPUT", help=profile_output_help)
 ):
     """
     Search and format the order details with optional filtering, sorting, grouping, and summarization.
     """
-    from src.search import search
-    search(product_name, set_name, user_name, date_of_purchase, foiliness, sort_by, sort_order, display_columns, limit)
+    from src.profiling import profiling
+    with profiling(profile, profile_output):
+        if queries:
+            from src.search import batch_search, read_queries
+            batch_search(read_queries(queries), set_name, user_name, date_of_purchase, foiliness, jobs)
+            return
+
+        from src.search import search
+        search(product_name, set_name, user_name, date_of_purchase, foiliness, sort_by, sort_order, display_columns, limit, jobs, engine, compact, output_format=output_format, pager=pager, fuzzy=fuzzy, explain=explain)
+
+@app.command()
+def shell(
+    jobs: int = typer.Option(1, "-j", "--jobs", help=jobs_help),
+    compact: bool = typer.Option(False, "-c", "--compact", help=compact_help)
+):
+    """
+    Interactive search shell. Loads the orders once and takes the same options as search on every line.
+    """
+    from typer.main import get_command
+    from src.shell import run_shell
+    run_shell(get_command(app).commands["search"], jobs, compact)
 
 @app.command()
 def generate_reports(
@@ -67,6 +109,24 @@ def generate_reports(
     from src.downloads import generate_reports
     generate_reports(all, year, month, current_month, previous_month)
 
+@app.command()
+def sync(
+    all: bool = typer.Option(None, "-a", "--all", help="Syncs all reports"),
+    year: int = typer.Option(None, "-y", "--year", help="Syncs reports for this year"),
+    month: int = typer.Option(None, "-m", "--month", help="In combination with year, limits the sync to this month"),
+    current_month: bool = typer.Option(False, "-c", "--current-month", help="Sync the report for the current month"),
+    previous_month: bool = typer.Option(False, "-p", "--previous-month", help="Sync the report for the previous month"),
+    concurrency: int = typer.Option(2, "-n", "--concurrency", help="Number of reports downloaded at the same time"),
+    rate: float = typer.Option(6.0, "-r", "--rate", help="Most requests started per minute, shared by all requests of the sync"),
+    timeout: int = typer.Option(15, "-t", "--timeout", help="Minutes to wait for Cardmarket to generate the reports"),
+    jobs: int = typer.Option(1, "-j", "--jobs", help=jobs_help)
+):
+    """
+    Generate reports, download each one as soon as Cardmarket has it ready and add it to the search cache, with one login.
+    """
+    from src.downloads import sync_reports
+    sync_reports(all, year, month, current_month, previous_month, concurrency, rate, timeout * 60, jobs)
+
 @app.callback(invoke_without_command=True)
 def main(
     version: bool = typer.Option(
@@ -83,4 +143,7 @@ def main(
 
 
 if __name__ == "__main__":
+    # Needed for worker processes in the PyInstaller build
+    from multiprocessing import freeze_support
+    freeze_support()
     app()
\ No newline at end of file
@@ -0,0 +1,97 @@
+import os
+import numpy as np
+import pandas as pd
+from src.cache import load_arrays, save_arrays
+from src.columns import (
+    foiliness_column, quality_column, language_column, set_name_column, user_name_column, foil_marker, non_foil_marker,
+)
+
+# Columns with few distinct values, a filter on them is answered from the row ids of the matching values
+INDEXED_COLUMNS = [foiliness_column, quality_column, language_column, set_name_column, user_name_column]
+
+INDEX_FILE = "rows.npz"
+
+# The last index loaded, a shell searches the same dataset many times
+loaded = {}
+
+
+class RowIndex:
+    """
+    The ascending row positions of every distinct value of the indexed columns. The rows of
+    values[column][i] are rows[column][offsets[column][i]:offsets[column][i + 1]].
+    """
+    def __init__(self, length, values, offsets, rows):
+        self.length = length
+        self.values = values
+        self.offsets = offsets
+        self.rows = rows
+
+    @classmethod
+    def build(cls, df: pd.DataFrame):
+        values, offsets, rows = {}, {}, {}
+        dtype = np.int32 if len(df) < 2 ** 31 else np.int64
+        for column in INDEXED_COLUMNS:
+            series = df[column]
+            if pd.api.types.is_bool_dtype(series):
+                # The compact layout keeps the foil markers as a bool
+                series = pd.Series(np.where(series, foil_marker, non_foil_marker))
+            codes, uniques = pd.factorize(series, sort=True)
+            # Grouped by value, in row order within a value; missing values (code -1) sort first and are left out
+            order = np.argsort(codes, kind="stable")
+            missing = np.count_nonzero(codes < 0)
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            values[column] = np.asarray(uniques, dtype=str)
+            offsets[column] = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+            rows[column] = order[missing:].astype(dtype)
+        return cls(len(df), values, offsets, rows)
+
+    def lookup(self, column: str, value) -> np.ndarray:
+        """
+        Ascending positions of the rows a filter on column matches, with the same matching as filter_data:
+        a tuple is a set of exact values, the foil marker an exact value, anything else a case-insensitive regex.
+        """
+        values = self.values[column]
+        if isinstance(value, tuple):
+            matches = np.flatnonzero(np.isin(values, list(value)))
+        elif column == foiliness_column:
+            matches = np.flatnonzero(values == value)
+        else:
+            matches = np.flatnonzero(pd.Index(values).str.contains(value, case=False, na=False))
+
+        rows, offsets = self.rows[column], self.offsets[column]
+        if len(matches) == 1:
+            return rows[offsets[matches[0]]:offsets[matches[0] + 1]]
+        return np.sort(np.concatenate([rows[offsets[i]:offsets[i + 1]] for i in matches] or [rows[:0]]))
+
+
+def is_indexed(key: str, value) -> bool:
+    return key in INDEXED_COLUMNS and isinstance(value, (str, tuple))
+
+
+def load_row_index(cache_directory: str, version: str, df: pd.DataFrame) -> RowIndex:
+    """
+    The RowIndex of df, which has to be the dataset of this version. Read from the cache when
+    it was saved for the same version and number of rows, built and saved otherwise.
+    """
+    path = os.path.join(cache_directory, INDEX_FILE)
+    if path in loaded and loaded[path][0] == version and loaded[path][1].length == len(df):
+        return loaded[path][1]
+
+    index = None
+    arrays = load_arrays(path, version)
+    if arrays is not None and int(arrays["length"]) == len(df):
+        index = RowIndex(
+            len(df),
+            *({column: arrays[f"{column}.{part}"] for column in INDEXED_COLUMNS} for part in ("values", "offsets", "rows")),
+        )
+
+    if index is None:
+        index = RowIndex.build(df)
+        arrays = {"length": np.asarray(len(df))}
+        for column in INDEXED_COLUMNS:
+            for part in ("values", "offsets", "rows"):
+                arrays[f"{column}.{part}"] = getattr(index, part)[column]
+        save_arrays(path, version, arrays)
+
+    loaded[path] = (version, index)
+    return index
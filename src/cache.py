@@ -0,0 +1,173 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.profiling import stage
+from src.manifest import MANIFEST_FILE, known_hash, read_manifest
+from src.utils import file_hash
+
+# The cache lives next to the reports it was built from
+CACHE_DIRECTORY = os.path.join('csv_files', '.cache')
+CACHE_INDEX = 'index.json'
+
+# Bump when the parsed layout changes so stale partitions get rebuilt
+CACHE_VERSION = 4
+
+# Arrow backed text with NaN for missing values, the default str dtype of pandas 3. pandas 2 would
+# turn Arrow strings into object columns, so it is asked for explicitly.
+STRING_DTYPE = pd.StringDtype("pyarrow", na_value=np.nan)
+
+
+def load_reports(file_paths, read_report, cache_directory=CACHE_DIRECTORY, jobs=1, include=None):
+    """
+    Return the normalized frame for all reports, re-parsing only the ones that are new or changed.
+    Returns None when no report is loaded.
+    """
+    frames = load_partitions(file_paths, read_report, cache_directory, jobs, include)
+    if not frames:
+        return None
+
+    # Empty reports would otherwise widen every column to object
+    frames = list(frames.values())
+    with stage("concat") as record:
+        df = pd.concat([df for df in frames if not df.empty] or frames, ignore_index=True)
+        record.rows = len(df)
+    return df
+
+
+def load_partitions(file_paths, read_report, cache_directory=CACHE_DIRECTORY, jobs=1, include=None, transform=None):
+    """
+    Return {file path: normalized frame} in file order. Every report is stored as its own Parquet
+    partition keyed by size, mtime and SHA-256. Stale reports are parsed by up to `jobs` worker
+    processes. Reports rejected by `include` are neither loaded nor parsed, but their partitions are kept.
+    `transform` is applied to each frame as soon as it is loaded, so only its result is held on to.
+    """
+    transform = transform or (lambda df: df)
+    from src.utils import parallel_map
+    os.makedirs(cache_directory, exist_ok=True)
+    index = read_index(cache_directory)
+    entries = index["partitions"]
+    # Downloaded reports come with their hash, so a touched or re-downloaded report isn't read twice
+    manifest = read_manifest(os.path.join(os.path.dirname(cache_directory), os.path.basename(MANIFEST_FILE)))
+
+    all_file_paths = sorted(file_paths)
+    file_paths = [file_path for file_path in all_file_paths if include is None or include(file_path)]
+    frames = {}
+    stale = []
+    for file_path in file_paths:
+        filename = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        entry = entries.get(filename)
+        partition_path = os.path.join(cache_directory, filename + ".parquet")
+
+        if entry and is_fresh(entry, stat, file_path, manifest.get(filename)) and os.path.exists(partition_path):
+            # Same content, possibly touched; remember the new stat so the hash isn't recomputed
+            entry["size"], entry["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+            with stage("read_cache") as record:
+                df = pq.read_table(partition_path).to_pandas(types_mapper=arrow_dtype)
+                record.rows = len(df)
+                frames[file_path] = transform(df)
+        else:
+            stale.append(file_path)
+
+    parsed = []
+    if stale:
+        with stage("parse_reports") as record:
+            parsed = parallel_map(read_report, stale, jobs)
+            record.rows = sum(len(df) for df in parsed)
+
+    for file_path, df in zip(stale, parsed):
+        filename = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        with stage("write_cache"):
+            write_partition(df, os.path.join(cache_directory, filename + ".parquet"))
+        entries[filename] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": known_hash(manifest.get(filename), stat) or file_hash(file_path),
+        }
+        frames[file_path] = transform(df)
+
+    current = {os.path.basename(file_path) for file_path in all_file_paths}
+    # Drop partitions whose report has been removed
+    for filename in set(entries) - current:
+        del entries[filename]
+    for partition in os.listdir(cache_directory):
+        if partition.endswith(".parquet") and partition[:-len(".parquet")] not in current:
+            os.remove(os.path.join(cache_directory, partition))
+
+    write_index(index, cache_directory)
+    # Keep the file order no matter which reports came from the cache
+    return {file_path: frames[file_path] for file_path in file_paths}
+
+
+def is_fresh(entry, stat, file_path, manifest_entry=None):
+    if entry["size"] != stat.st_size:
+        return False
+    if entry["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    # Same size but touched, only the content can tell
+    return entry["sha256"] == (known_hash(manifest_entry, stat) or file_hash(file_path))
+
+
+def arrow_dtype(arrow_type):
+    """
+    The pandas dtype of an Arrow column, None leaves it to pandas. Given to Table.to_pandas as types_mapper.
+    """
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return STRING_DTYPE
+    return None
+
+
+def write_partition(df, partition_path):
+    # Write next to the target and swap it in, so a crash never leaves half a partition
+    temp_path = partition_path + ".tmp"
+    df.to_parquet(temp_path, index=False)
+    os.replace(temp_path, partition_path)
+
+
+def save_arrays(path, version, arrays):
+    """
+    Save arrays to the .npz file at path, tagged with the version of the data they were built from.
+    """
+    # Written next to the final file and moved over it, so a reader never sees half a file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = path + ".tmp.npz"
+    np.savez(temp_path, version=np.asarray(version), **arrays)
+    os.replace(temp_path, path)
+
+
+def load_arrays(path, version):
+    """
+    The arrays save_arrays wrote to path, None when there is no readable file of this version.
+    """
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["version"]) != version:
+                return None
+            return {name: data[name] for name in data.files if name != "version"}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def read_index(cache_directory):
+    index_path = os.path.join(cache_directory, CACHE_INDEX)
+    try:
+        with open(index_path, "r", encoding="utf-8") as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        index = None
+
+    if not index or index.get("version") != CACHE_VERSION:
+        return {"version": CACHE_VERSION, "partitions": {}}
+    return index
+
+
+def write_index(index, cache_directory):
+    index_path = os.path.join(cache_directory, CACHE_INDEX)
+    temp_path = index_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(index, file, indent=2)
+    os.replace(temp_path, index_path)
@@ -0,0 +1,25 @@
+# Column names of the normalized order frame. Kept free of imports so the CLI can load it without pandas.
+
+product_field = "Description" #"Localized Product Name"
+
+product_name_column = "Product Name"
+set_name_column = "Set Name"
+user_name_column = "Username"
+date_of_purchase_column = "Purchased"
+total_price_column = "Sum"
+quantity_column = "Qty"
+order_id_column = "OrderID"
+shipment_cost_column = "Shipment Costs"
+quality_column = "Quality"
+language_column = "Lang"
+foiliness_column = "Foil"
+
+# Values of the foil column
+foil_marker = "⭐"
+non_foil_marker = "❌"
+
+original_header = [
+    order_id_column, user_name_column, 'Name', 'Street', 'City', 'Country', 'Is Professional', 'VAT Number', 
+    date_of_purchase_column, 'Article Count', 'Merchandise Value', shipment_cost_column, 'Trustee service fee', 
+    'Total Value', 'Currency', 'Description', 'Product ID', 'Localized Product Name'
+]
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+from src.columns import (
+    product_name_column, set_name_column, user_name_column, date_of_purchase_column, total_price_column,
+    quantity_column, order_id_column, quality_column, language_column, foiliness_column, foil_marker,
+    non_foil_marker, original_header,
+)
+
+# Product level columns, plus the order columns searches filter on
+product_columns = [
+    order_id_column, quantity_column, product_name_column, set_name_column, "Price", quality_column,
+    foiliness_column, language_column, total_price_column, user_name_column, date_of_purchase_column,
+]
+# Everything else about an order is stored once per order and only joined for display
+order_columns = [order_id_column] + [column for column in original_header if column not in product_columns]
+
+category_columns = [product_name_column, set_name_column, quality_column, language_column, user_name_column]
+order_category_columns = ["Country", "Currency"]
+# Unit prices are kept as whole cents, exact and half the size of a float64. Sum stays a float64:
+# quantity times price is rarely a whole number of cents in floating point, and rounding it would
+# change the totals shown and the order of rows sorted by it
+cents_columns = ["Price"]
+
+
+def split_orders(df: pd.DataFrame):
+    """
+    Split a normalized frame into a compact product table and an order table with one row per order.
+    Foil becomes a bool, quantities float32, unit prices cents and dates datetime64. Categories are set by join_partitions.
+    """
+    products = df[product_columns].copy()
+    products[foiliness_column] = products[foiliness_column].eq(foil_marker)
+    products[quantity_column] = products[quantity_column].astype("float32")
+    for column in cents_columns:
+        products[column] = products[column].astype(float).mul(100).round().astype("Int32")
+    products[date_of_purchase_column] = pd.to_datetime(products[date_of_purchase_column])
+    orders = df[order_columns].drop_duplicates(order_id_column)
+    return products, orders
+
+
+def join_partitions(parts):
+    """
+    Concatenate the (products, orders) pairs of split_orders into one compact pair.
+    """
+    parts = list(parts)
+    products = pd.concat([part[0] for part in parts], ignore_index=True)
+    orders = pd.concat([part[1] for part in parts], ignore_index=True).drop_duplicates(order_id_column)
+
+    # Categories are only set once all partitions are in, so they share one set of categories
+    products[category_columns] = products[category_columns].astype("category")
+    orders[order_category_columns] = orders[order_category_columns].astype("category")
+    return products, orders.set_index(order_id_column)
+
+
+def expand_orders(products: pd.DataFrame, orders: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turn the compact rows back into the normalized layout, meant for the few rows that get shown.
+    """
+    df = products.join(orders, on=order_id_column)
+    df[foiliness_column] = np.where(df[foiliness_column], foil_marker, non_foil_marker)
+    df[quantity_column] = df[quantity_column].astype(float)
+    for column in cents_columns:
+        df[column] = df[column].astype(float) / 100
+    columns = [column for column in product_columns if column not in original_header]
+    return df[[order_id_column, *columns, *original_header[1:]]]
@@ -0,0 +1,193 @@
+import os
+import re
+import sqlite3
+from functools import lru_cache
+import pandas as pd
+from src.matcher import is_literal_pattern
+from src.columns import date_of_purchase_column, foiliness_column, product_name_column, set_name_column, user_name_column, quality_column
+
+# The database is derived from the reports, like the Parquet cache it can always be rebuilt
+DATABASE_FILE = os.path.join('csv_files', '.cache', 'orders.db')
+DATABASE_VERSION = 1
+
+# Reports are moved into the database a few at a time to keep memory flat
+SYNC_BATCH_SIZE = 12
+
+# Columns with an FTS5 trigram index, used for substring searches
+fts_columns = {product_name_column: "product_name", set_name_column: "set_name"}
+indexed_columns = [user_name_column, date_of_purchase_column, foiliness_column, quality_column]
+
+
+def connect(database_file=DATABASE_FILE):
+    """
+    Open the orders database, recreating it when it was built by another version.
+    """
+    from src.cache import CACHE_VERSION
+    os.makedirs(os.path.dirname(database_file), exist_ok=True)
+    connection = sqlite3.connect(database_file)
+    connection.create_function("regexp", 2, regexp, deterministic=True)
+
+    # Rows come from the cache partitions, so a new partition layout also means a rebuild
+    version = DATABASE_VERSION * 1000 + CACHE_VERSION
+    if connection.execute("PRAGMA user_version").fetchone()[0] != version:
+        connection.executescript("""
+            DROP TABLE IF EXISTS orders;
+            DROP TABLE IF EXISTS products_fts;
+            DROP TABLE IF EXISTS reports;
+        """)
+        connection.execute(f"PRAGMA user_version = {version}")
+
+    connection.executescript(f"""
+        CREATE TABLE IF NOT EXISTS reports (filename TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER);
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5({", ".join(fts_columns.values())}, tokenize='trigram');
+    """)
+    return connection
+
+
+def sync(connection, jobs=1):
+    """
+    Bring the database in line with the reports in csv_files, only new or changed reports are reloaded.
+    """
+    from src.cache import load_partitions
+    from src.search import read_report, report_files
+
+    file_paths = report_files()
+    known = {filename: (size, mtime_ns) for filename, size, mtime_ns in connection.execute("SELECT * FROM reports")}
+    changed = []
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        if known.get(os.path.basename(file_path)) != (stat.st_size, stat.st_mtime_ns):
+            changed.append(file_path)
+
+    current = {os.path.basename(file_path) for file_path in file_paths}
+    for filename in (set(known) - current) | {os.path.basename(file_path) for file_path in changed}:
+        delete_report(connection, filename)
+
+    for start in range(0, len(changed), SYNC_BATCH_SIZE):
+        batch = set(changed[start:start + SYNC_BATCH_SIZE])
+        frames = load_partitions(file_paths, read_report, jobs=jobs, include=batch.__contains__)
+        for file_path, df in frames.items():
+            insert_report(connection, file_path, df)
+    connection.commit()
+
+
+def delete_report(connection, filename):
+    if table_exists(connection, "orders"):
+        connection.execute("DELETE FROM products_fts WHERE rowid IN (SELECT rowid FROM orders WHERE source = ?)", (filename,))
+        connection.execute("DELETE FROM orders WHERE source = ?", (filename,))
+    connection.execute("DELETE FROM reports WHERE filename = ?", (filename,))
+
+
+def insert_report(connection, file_path, df):
+    filename = os.path.basename(file_path)
+    stat = os.stat(file_path)
+
+    if not df.empty:
+        df = df.copy()
+        # ISO dates compare correctly as text
+        df[date_of_purchase_column] = pd.to_datetime(df[date_of_purchase_column]).dt.strftime("%Y-%m-%d")
+        df["source"] = filename
+        df.to_sql("orders", connection, if_exists="append", index=False)
+
+        fts_names = ", ".join(fts_columns.values())
+        fts_values = ", ".join(quote(column) for column in fts_columns)
+        connection.execute(
+            f"INSERT INTO products_fts(rowid, {fts_names}) SELECT rowid, {fts_values} FROM orders WHERE source = ?",
+            (filename,),
+        )
+        for column in ["source", *indexed_columns]:
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {index_name(column)} ON orders({quote(column)})")
+
+    connection.execute("INSERT INTO reports VALUES (?, ?, ?)", (filename, stat.st_size, stat.st_mtime_ns))
+
+
+def query_orders(columns: list, sort_by: str, ascending: bool, limit: int, jobs: int = 1) -> pd.DataFrame:
+    """
+    Answer a search from the database with one SQL query. Takes the same filter list as filter_data,
+    and returns at most limit + 1 rows so the caller can tell there were more.
+    """
+    from src.search import empty_report
+    connection = connect()
+    try:
+        sync(connection, jobs)
+        if not table_exists(connection, "orders"):
+            return empty_report()
+
+        sql, parameters = compile_query(connection, columns, sort_by, ascending, limit)
+        return pd.read_sql_query(sql, connection, params=parameters).drop(columns="source")
+    finally:
+        connection.close()
+
+
+def compile_query(connection, columns: list, sort_by: str, ascending: bool, limit: int):
+    from src.search import parse_date_filter
+    table_columns = [row[1] for row in connection.execute("PRAGMA table_info(orders)")]
+
+    clauses, parameters = [], []
+    for column in columns:
+        for key, value in column.items():
+            if key not in table_columns:
+                raise KeyError(key)
+
+            if key == date_of_purchase_column:
+                lower, upper = parse_date_filter(value)
+                if lower is not None:
+                    clauses.append(f"{quote(key)} >= ?")
+                    parameters.append(lower.isoformat())
+                if upper is not None:
+                    clauses.append(f"{quote(key)} <= ?")
+                    parameters.append(upper.isoformat())
+            elif key == foiliness_column:
+                # Foil is either ⭐ or ❌, so containment is equality and can use the index
+                clauses.append(f"{quote(key)} = ?")
+                parameters.append(value)
+            elif is_literal(value) and key in fts_columns:
+                clauses.append(f"rowid IN (SELECT rowid FROM products_fts WHERE {fts_columns[key]} LIKE ?)")
+                parameters.append(f"%{value}%")
+            elif is_literal(value):
+                clauses.append(f"{quote(key)} LIKE ?")
+                parameters.append(f"%{value}%")
+            else:
+                clauses.append(f"{quote(key)} REGEXP ?")
+                parameters.append(value)
+
+    sql = "SELECT * FROM orders"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if sort_by:
+        if sort_by not in table_columns:
+            raise KeyError(sort_by)
+        # Missing values last, like pandas
+        direction = "ASC" if ascending else "DESC"
+        sql += f" ORDER BY {quote(sort_by)} IS NULL, {quote(sort_by)} {direction}, rowid"
+    if limit >= 0:
+        sql += " LIMIT ?"
+        parameters.append(limit + 1)
+    return sql, parameters
+
+
+def is_literal(value: str) -> bool:
+    # LIKE wildcards count as special too, those values go through REGEXP
+    return is_literal_pattern(value) and not re.search(r"[%_]", value)
+
+
+@lru_cache(maxsize=64)
+def compiled(pattern):
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def regexp(pattern, value):
+    # Same semantics as str.contains(case=False, na=False)
+    return value is not None and compiled(pattern).search(str(value)) is not None
+
+
+def table_exists(connection, name):
+    return connection.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def index_name(column):
+    return "idx_orders_" + re.sub(r"\W", "_", column).lower()
@@ -1,13 +1,27 @@
 import os
-from time import sleep
+import glob
+from time import sleep, monotonic
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
-from src.utils import request_delay
+from src.utils import file_hash
+from src.pages import parse_downloads, parse_report_form
+from src.throttle import DEFAULT_RATE, RateController
+from src.transfers import DEFAULT_CONCURRENCY, PART_SUFFIX, download_files, partial_path
 
 # Define the directory for CSV files
 CSV_DIR = "csv_files"
 
-def download_reports(year=None, month=None):
+downloads_url = "https://www.cardmarket.com/en/Magic/Account/Downloads"
+download_url = "https://www.cardmarket.com/en/Magic/PostGetAction/User_Reporting_DownloadReportFileFromAws"
+stats_url = "https://www.cardmarket.com/en/Magic/Account/Statistics"
+report_url = "https://www.cardmarket.com/en/Magic/PostGetAction/Reports_Asynchronous_GetMonthlyPurchaseSummary"
+
+# Waits between looks at the Downloads page while reports are generated
+POLL_INTERVAL = 15
+MAX_POLL_INTERVAL = 120
+POLL_BACKOFF = 1.5
+SYNC_TIMEOUT = 15 * 60
+
+def download_reports(year=None, month=None, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE):
     if (year and not month) or (month and not year):
         print('Both year and month needs to be defined at the same time, or left out')
         exit(1)
@@ -22,77 +36,98 @@ def download_reports(year=None, month=None):
     # Load the Downloads page
     from src.login import login
     try:
-        scraper = login()
+        scraper = login(RateController(rate))
     except Exception as e:
         print(f"Login failed: {e}")
         exit(1)
 
-    downloads_url = "https://www.cardmarket.com/en/Magic/Account/Downloads"
-    downloads_page = scraper.get(downloads_url)
-    
+    reports = list_downloads(scraper)
     # Check if the page loaded correctly
-    if downloads_page.status_code != 200:
+    if reports is None:
         print("Failed to load the Downloads page.")
         return
-    
-    # Parse the HTML to extract download details
-    soup = BeautifulSoup(downloads_page.text, "html.parser")
-    
-    # Find all rows with download links
-    rows = soup.find_all("form", action="/en/Magic/PostGetAction/User_Reporting_DownloadReportFileFromAws")
-    # Remove duplicates
-    rows = list({str(row): row for row in rows}.values())
-    for row in rows:
-        
-        # Get __cmtkn and idRequest values
-        token_value = row.find("input", {"name": "__cmtkn"})["value"]
-        id_request = row.find("input", {"name": "idRequest"})["value"]
-        
-        # Get the filename from the button text
-        filename = row.find("button").text.strip()
+
+    from src.manifest import read_manifest
+    manifest = read_manifest()
+    transfers = []
+    for report in newest_reports(reports):
+        filename = report.filename
         file_path = os.path.join(CSV_DIR, filename)
-        
-        # Extract year and month from the filename
-        file_year, file_month = None, None
-        try:
-            # Extract year and month assuming filename contains "YYYY-MM"
-            file_year, file_month = map(int, filename.split("-byPurchaseDate-")[1].split("-")[:2])
-        except (IndexError, ValueError):
+        if report.year is None:
             print(f"Could not extract year/month from filename: {filename}")
             continue
 
         # Determine whether to download based on input
         if year is not None and month is not None:
-            if file_year != year or file_month != month:
+            if report.year != year or report.month != month:
                 continue  # Skip files that don't match the specified year/month
 
             # Force download even if file exists
             print(f"Forcing download for {filename}...")
-        elif os.path.exists(file_path):
+        elif is_downloaded(file_path, report.id_request, manifest):
             print(f"{filename} already downloaded.")
             continue
+        elif filename in manifest and os.path.exists(file_path):
+            print(f"{filename} changed since it was downloaded, downloading it again.")
+
+        transfers.append(prepare_transfer(file_path, report))
+
+    # A few transfers at a time, spaced out by the rate controller instead of a sleep after each one
+    download_files(scraper, download_url, transfers, concurrency, on_saved)
+    print(scraper.controller.summary())
+
+def list_downloads(scraper):
+    """
+    The reports on the Downloads page as DownloadEntry records, None when the page doesn't load.
+    """
+    downloads_page = scraper.get(downloads_url)
+    if downloads_page.status_code != 200:
+        return None
+    return parse_downloads(downloads_page.text)
+
+def newest_reports(reports):
+    """
+    One report per filename, in page order. When a month was generated more than once the page
+    lists every request, only the newest (highest idRequest) is the one to keep on disk.
+    """
+    def request_number(report):
+        return int(report.id_request) if report.id_request.isdigit() else -1
+
+    newest = {}
+    for report in reports:
+        if report.filename not in newest or request_number(report) > request_number(newest[report.filename]):
+            newest[report.filename] = report
+    return [report for report in reports if newest[report.filename] is report]
+
+def is_downloaded(file_path, id_request, manifest):
+    """
+    True when this request of the report is on disk in full. Reports downloaded before there was
+    a manifest are trusted and recorded as they are.
+    """
+    from src.manifest import is_complete, record_download
+    filename = os.path.basename(file_path)
+    if filename not in manifest and os.path.exists(file_path):
+        record_download(file_path, id_request, os.path.getsize(file_path), file_hash(file_path))
+        return True
+    return is_complete(file_path, manifest.get(filename)) and manifest[filename]["idRequest"] == id_request
+
+def prepare_transfer(file_path, report):
+    # Prepare payload for download
+    payload = {
+        "__cmtkn": report.token,
+        "idRequest": report.id_request,
+    }
+
+    # Partial downloads of other requests for this report can't be continued any more
+    for part in glob.glob(glob.escape(file_path) + ".*" + PART_SUFFIX):
+        if part != partial_path(file_path, payload):
+            os.remove(part)
+    return file_path, payload
+
+def on_saved(file_path, payload, size, sha256):
+    from src.manifest import record_download
+    record_download(file_path, payload["idRequest"], size, sha256)
 
-        # Prepare payload for download
-        download_url = "https://www.cardmarket.com/en/Magic/PostGetAction/User_Reporting_DownloadReportFileFromAws"
-        payload = {
-            "__cmtkn": token_value,
-            "idRequest": id_request,
-        }
-        
-        # Send the POST request to download the file
-        response = scraper.post(download_url, data=payload)
-        
-        # Check for successful download
-        if response.status_code == 200:
-            with open(file_path, "wb") as file:
-                file.write(response.content)
-            print(f"Downloaded {filename}")
-        else:
-            print(f"Failed to download {filename}")
-        
-        # Add a 10-second delay after each download
-        sleep(request_delay())
-  
 
 def generate_reports(all, year, month, current_month, previous_month):
     """
@@ -106,80 +141,160 @@ def generate_reports(all, year, month, current_month, previous_month):
         except Exception as e:
             print(f"Login failed: {e}")
             exit(1)
-            
-        # Access the statistics page to retrieve the hidden token and user information
-        stats_url = "https://www.cardmarket.com/en/Magic/Account/Statistics"
-        response = scraper.get(stats_url)
-        
-        if response.status_code != 200:
-            raise Exception("Failed to load the statistics page")
-
-        # Parse HTML to find hidden fields
-        soup = BeautifulSoup(response.text, 'html.parser')
-        hidden_token = soup.find("input", {"name": "__cmtkn"})["value"]
-        id_user = soup.find("input", {"name": "idUser"})["value"]
-        price_for_buyer = soup.find("input", {"name": "priceForBuyer"})["value"]
-
-        # Extract available months and years
-        mkm_months = {option['value']: option.text for option in soup.select('select[name="month"] option')}
-        mkm_years = {option['value']: option.text for option in soup.select('select[name="year"] option')}
-        default_report_type = 'datePurchased'  # Set to "Purchase Date"
-
-        # Corrected URL for report generation
-        report_url = "https://www.cardmarket.com/en/Magic/PostGetAction/Reports_Asynchronous_GetMonthlyPurchaseSummary"
-
-
-        # Handle current month and previous month logic
-        if all:
-            years_to_generate = mkm_years.keys()
-            months_to_generate = mkm_months.keys()
-        # Handle current month and previous month logic
-        elif current_month:
-            today = datetime.today()
-            years_to_generate = [str(today.year)]
-            months_to_generate = [str(today.month)]
-        elif previous_month:
-            today = datetime.today()
-            first_day_current_month = today.replace(day=1)
-            last_month = first_day_current_month - timedelta(days=1)
-            years_to_generate = [str(last_month.year)]
-            months_to_generate = [str(last_month.month)]
-        elif year:
-            years_to_generate = [year]
-            if month:
-                months_to_generate = [month]
-            else:
-                months_to_generate = [1,2,3,4,5,6,7,8,9,10,11,12]
-        else:
-            years_to_generate = []
-            months_to_generate = []
 
+        form = load_report_form(scraper)
         # Loop over the specified years and months
-        for year_value in years_to_generate:
-            for month_value in months_to_generate:
-                if not is_future_date(year_value, month_value):
-                    payload = {
-                        '__cmtkn': hidden_token,
-                        'idUser': id_user,
-                        'priceForBuyer': price_for_buyer,
-                        'month': month_value,
-                        'year': year_value,
-                        'dateUsed': default_report_type,
-                        'format': 'csv',  # or 'xls' based on preference
-                    }
-                    
-                    # Send a single POST request to initiate the report generation
-                    report_response = scraper.post(report_url, data=payload)
-                    
-                    if report_response.status_code == 200:
-                        print(f"Report generation initiated for {year_value}-{month_value} (Purchase Date)")
-                    else:
-                        print(f"Failed to initiate report for {year_value}-{month_value} (Purchase Date)")
-                        continue  # Skip to the next combination if report generation fails
-                    
-                    sleep(request_delay())  # Sleep for the specified delay
+        for year_value, month_value in months_to_generate(form, all, year, month, current_month, previous_month):
+            request_report(scraper, form, year_value, month_value)
+        print(scraper.controller.summary())
+    except Exception as e:
+        print(e)
+
+def load_report_form(scraper):
+    """
+    The report form on the statistics page, as a ReportForm.
+    """
+    # Access the statistics page to retrieve the hidden token and user information
+    response = scraper.get(stats_url)
+
+    if response.status_code != 200:
+        raise Exception("Failed to load the statistics page")
+    return parse_report_form(response.text)
+
+def months_to_generate(form, all, year, month, current_month, previous_month):
+    """
+    The (year, month) pairs the options ask for, leaving out months that haven't started yet.
+    """
+    # Handle current month and previous month logic
+    if all:
+        years_to_generate = form.years.keys()
+        months_to_generate = form.months.keys()
+    # Handle current month and previous month logic
+    elif current_month:
+        today = datetime.today()
+        years_to_generate = [str(today.year)]
+        months_to_generate = [str(today.month)]
+    elif previous_month:
+        today = datetime.today()
+        first_day_current_month = today.replace(day=1)
+        last_month = first_day_current_month - timedelta(days=1)
+        years_to_generate = [str(last_month.year)]
+        months_to_generate = [str(last_month.month)]
+    elif year:
+        years_to_generate = [year]
+        if month:
+            months_to_generate = [month]
+        else:
+            months_to_generate = [1,2,3,4,5,6,7,8,9,10,11,12]
+    else:
+        years_to_generate = []
+        months_to_generate = []
+
+    return [
+        (year_value, month_value)
+        for year_value in years_to_generate
+        for month_value in months_to_generate
+        if not is_future_date(year_value, month_value)
+    ]
+
+def request_report(scraper, form, year_value, month_value):
+    default_report_type = 'datePurchased'  # Set to "Purchase Date"
+    payload = {
+        '__cmtkn': form.token,
+        'idUser': form.id_user,
+        'priceForBuyer': form.price_for_buyer,
+        'month': month_value,
+        'year': year_value,
+        'dateUsed': default_report_type,
+        'format': 'csv',  # or 'xls' based on preference
+    }
+
+    # Send a single POST request to initiate the report generation
+    report_response = scraper.post(report_url, data=payload)
+
+    if report_response.status_code == 200:
+        print(f"Report generation initiated for {year_value}-{month_value} (Purchase Date)")
+        return True
+    print(f"Failed to initiate report for {year_value}-{month_value} (Purchase Date)")
+    return False
+
+
+def sync_reports(all, year, month, current_month, previous_month, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, timeout=SYNC_TIMEOUT, jobs=1):
+    """
+    Generate reports, wait for them on the Downloads page, download each one as soon as it is
+    listed and parse it into the search cache with jobs processes, all with one login. Every
+    request to Cardmarket goes through the same rate controller.
+    """
+    from src.login import login
+    try:
+        scraper = login(RateController(rate))
+    except Exception as e:
+        print(f"Login failed: {e}")
+        exit(1)
+    os.makedirs(CSV_DIR, exist_ok=True)
+
+    try:
+        form = load_report_form(scraper)
+        wanted = [(int(y), int(m)) for y, m in months_to_generate(form, all, year, month, current_month, previous_month)]
+        if not wanted:
+            print("No months to sync, pass --all, --year, --current-month or --previous-month.")
+            return
+
+        # Reports listed before the new ones were asked for are outdated
+        listed = list_downloads(scraper)
+        if listed is None:
+            raise Exception("Failed to load the Downloads page")
+        seen = {report.id_request for report in listed}
+
+        pending = set()
+        for year_value, month_value in wanted:
+            if request_report(scraper, form, year_value, month_value):
+                pending.add((year_value, month_value))
     except Exception as e:
-        print(e)          
+        print(e)
+        return
+
+    interval = POLL_INTERVAL
+    deadline = monotonic() + timeout
+    while pending:
+        if monotonic() > deadline:
+            print("Gave up waiting for " + ", ".join(f"{y}-{m:02d}" for y, m in sorted(pending)))
+            break
+        sleep(interval)
+        interval = min(interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
+
+        listed = list_downloads(scraper)
+        if listed is None:
+            print("Failed to load the Downloads page, trying again.")
+            continue
+
+        ready = []
+        for report in listed:
+            key = (report.year, report.month)
+            if key in pending and report.id_request not in seen:
+                pending.discard(key)
+                seen.add(report.id_request)
+                ready.append(prepare_transfer(os.path.join(CSV_DIR, report.filename), report))
+        if not ready:
+            print(f"Waiting for {len(pending)} report(s)...")
+            continue
+
+        # Something came through, look again soon for the rest
+        interval = POLL_INTERVAL
+        saved = download_files(scraper, download_url, ready, concurrency, on_saved)
+        ingest_reports([file_path for file_path, ok in saved.items() if ok], jobs)
+    print(scraper.controller.summary())
+
+def ingest_reports(file_paths, jobs=1):
+    """
+    Parse freshly downloaded reports into the search cache in jobs processes, so the next search starts warm.
+    """
+    if not file_paths:
+        return
+    from src.cache import load_partitions
+    from src.search import read_report, report_files
+    load_partitions(report_files(), read_report, jobs=jobs, include=set(file_paths).__contains__)
+    print(f"Added {len(file_paths)} report(s) to the search cache")
 
 def is_future_date(year, month):
     """
@@ -188,4 +303,4 @@ def is_future_date(year, month):
     today = datetime.today()
     if int(year) > today.year or (int(year) == today.year and int(month) > today.month):
         return True
-    return False
\ No newline at end of file
+    return False
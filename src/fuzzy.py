@@ -0,0 +1,100 @@
+import os
+import numpy as np
+from src.cache import load_arrays, save_arrays
+
+# Names at least this similar to the query are matches, pg_trgm uses the same default
+MIN_SIMILARITY = 0.3
+# At most this many of the best matching names are searched for
+MAX_MATCHES = 10
+
+INDEX_FILE = "names.npz"
+
+
+def trigrams(text: str) -> set:
+    """
+    The trigrams of every word in text, lowercased. Words are padded like pg_trgm does,
+    two spaces before and one after, so short words and word starts count as well.
+    """
+    grams = set()
+    for word in text.lower().split():
+        word = f"  {word} "
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    Inverted index from trigrams to the distinct names that contain them. The postings of all
+    trigrams are one array, the postings of grams[i] are ids[offsets[i]:offsets[i + 1]].
+    """
+    def __init__(self, names, grams, offsets, ids, sizes):
+        self.names = names
+        self.grams = grams
+        self.offsets = offsets
+        self.ids = ids
+        self.sizes = sizes
+
+    @classmethod
+    def build(cls, names):
+        names = np.asarray(sorted({str(name) for name in names}), dtype=str)
+        postings = {}
+        sizes = np.zeros(len(names), dtype=np.int32)
+        for name_id, name in enumerate(names):
+            grams = trigrams(name)
+            sizes[name_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(name_id)
+
+        grams = sorted(postings)
+        lengths = [len(postings[gram]) for gram in grams]
+        offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        ids = np.fromiter((name_id for gram in grams for name_id in postings[gram]), dtype=np.int32, count=offsets[-1])
+        return cls(names, np.asarray(grams, dtype=str), offsets, ids, sizes)
+
+    def lookup(self, query: str, limit: int = MAX_MATCHES, min_similarity: float = MIN_SIMILARITY) -> list:
+        """
+        (name, similarity) of the names most similar to query, best first. The similarity is the
+        share of trigrams two names have in common, out of all trigrams of both.
+        """
+        grams = np.asarray(sorted(trigrams(query)), dtype=str)
+        if not len(grams) or not len(self.grams):
+            return []
+        positions = np.searchsorted(self.grams, grams)
+        found = positions < len(self.grams)
+        found[found] = self.grams[positions[found]] == grams[found]
+        positions = positions[found]
+        if not len(positions):
+            return []
+
+        # Count the shared trigrams of every name that has any of them
+        ids = np.concatenate([self.ids[self.offsets[i]:self.offsets[i + 1]] for i in positions])
+        shared = np.bincount(ids, minlength=len(self.names))
+        candidates = np.flatnonzero(shared)
+        similarity = shared[candidates] / (len(grams) + self.sizes[candidates] - shared[candidates])
+        keep = similarity >= min_similarity
+        candidates, similarity = candidates[keep], similarity[keep]
+        # Best first, ties in name order (names are sorted, so by id)
+        best = np.lexsort((candidates, -similarity))[:limit]
+        return [(str(self.names[candidates[i]]), float(similarity[i])) for i in best]
+
+
+def load_index(cache_directory: str, version: str, columns: dict) -> dict:
+    """
+    {column: TrigramIndex} for the distinct names of every column. columns maps a column to
+    a function giving its names, only called when the persisted indexes are of another version.
+    """
+    path = os.path.join(cache_directory, INDEX_FILE)
+    arrays = load_arrays(path, version)
+    if arrays is not None and all(f"{column}.names" in arrays for column in columns):
+        return {
+            column: TrigramIndex(*(arrays[f"{column}.{part}"] for part in ("names", "grams", "offsets", "ids", "sizes")))
+            for column in columns
+        }
+
+    indexes = {column: TrigramIndex.build(names()) for column, names in columns.items()}
+    save_arrays(path, version, {
+        f"{column}.{part}": getattr(index, part)
+        for column, index in indexes.items() for part in ("names", "grams", "offsets", "ids", "sizes")
+    })
+    return indexes
@@ -1,19 +1,28 @@
 import os
+import json
 import time
 import pickle
 from getpass import getpass
 import cloudscraper
 from bs4 import BeautifulSoup
 import oyaml as yaml 
-from src.utils import request_delay
+from src.throttle import RateController, ThrottledSession
 
 cookie_file = "cardmarket.cookies"
+session_file = "cardmarket.session"
+# How long a verified session is trusted without loading a page to check it
+SESSION_TTL = 6 * 60 * 60
+# Cloudflare's bot management cookies live for minutes and cloudscraper renews them on its own,
+# they say nothing about whether the Cardmarket login still holds
+BOT_COOKIE_PREFIXES = ("__cf", "_cf", "cf_")
 config_file = 'config.yaml'
 cardmarket_base_url = "https://www.cardmarket.com/en/Magic"
 
-def login():
-    username, password = get_credentials()
-
+def login(controller: RateController = None):
+    """
+    A logged in session, every request made with it is paced by controller (a default one if None).
+    A session verified within SESSION_TTL is used without loading a page first.
+    """
     # Create a scraper with a real User-Agent and delay to bypass bot protection
     scraper = cloudscraper.create_scraper(
         browser={"browser": "chrome", "platform": "windows", "mobile": False},
@@ -32,10 +41,58 @@ def login():
     # Load persisted cookies (trusted device, session, cf) 
     load_cookies(scraper)
 
+    if is_session_trusted(scraper):
+        print("Using the saved session.")
+        return SavedSession(scraper, controller)
+
+    scraper = ThrottledSession(scraper, controller)
+    sign_in(scraper)
+    return scraper
+
+
+class SavedSession(ThrottledSession):
+    """
+    A session restored from the cookie jar without loading a page to check it. The first response
+    is checked instead: if it turns out logged out, the session logs in and sends the request again.
+    """
+    def __init__(self, session, controller: RateController = None):
+        super().__init__(session, controller)
+        self.unverified = True
+
+    def get(self, url, **kwargs):
+        return self.verified(super().get, url, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        return self.verified(super().post, url, data=data, **kwargs)
+
+    def verified(self, send, url, **kwargs):
+        response = send(url, **kwargs)
+        if not self.unverified:
+            return response
+
+        # The first request is made before any concurrent ones, so this runs once
+        self.unverified = False
+        if is_logged_out(response):
+            print("The saved session has expired.")
+            response.close()
+            forget_session()
+            sign_in(self)
+            return send(url, **kwargs)
+        save_session(self)
+        return response
+
+
+def sign_in(scraper):
+    """
+    Log the session in, unless the cookies already are. Remembers the session once it is verified.
+    """
+    username, password = get_credentials()
+
     # Check if already logged in (trusted device path)
     precheck = scraper.get(cardmarket_base_url)
     if "User_Logout" in precheck.text or "Logout" in precheck.text:
         print("Already logged in (trusted device).")
+        save_session(scraper)
         return scraper
 
     # Load main page and fetch CSRF token 
@@ -55,7 +112,6 @@ def login():
         "referalPage": "/en/Magic",
     }
 
-    time.sleep(request_delay())
     response = scraper.post(
         f"{cardmarket_base_url}/PostGetAction/User_Login",
         data=login_payload,
@@ -94,6 +150,7 @@ def login():
         verify = scraper.get(cardmarket_base_url)
         if "User_Logout" in verify.text or "Logout" in verify.text:
             save_cookies(scraper)
+            save_session(scraper)
             print("Login successful (with 2FA).")
             return scraper
 
@@ -103,6 +160,7 @@ def login():
     verify = scraper.get(cardmarket_base_url)
     if "User_Logout" in verify.text or "Logout" in verify.text:
         save_cookies(scraper)
+        save_session(scraper)
         print("Login successful (no 2FA).")
         return scraper
 
@@ -144,4 +202,54 @@ def load_cookies(scraper):
 
 def save_cookies(scraper):
     with open(cookie_file, "wb") as f:
-        pickle.dump(scraper.cookies, f)
\ No newline at end of file
+        pickle.dump(scraper.cookies, f)
+
+
+def is_session_trusted(scraper):
+    """
+    True when the session was verified less than SESSION_TTL ago and none of its session cookies has expired since.
+    """
+    try:
+        with open(session_file, "r", encoding="utf-8") as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    now = time.time()
+    if not session.get("verified") or now - session["verified"] > SESSION_TTL:
+        return False
+    expires = session.get("expires")
+    return (expires is None or expires > now) and all(
+        cookie.expires is None or cookie.expires > now for cookie in session_cookies(scraper)
+    )
+
+
+def save_session(scraper):
+    # The first session cookie to expire ends the session, whatever the TTL says
+    expiries = [cookie.expires for cookie in session_cookies(scraper) if cookie.expires is not None]
+    with open(session_file, "w", encoding="utf-8") as f:
+        json.dump({"verified": time.time(), "expires": min(expiries, default=None)}, f)
+
+
+def session_cookies(scraper):
+    """
+    The cookies that keep the Cardmarket login, leaving out Cloudflare's bot management cookies.
+    """
+    return [cookie for cookie in scraper.cookies if not cookie.name.startswith(BOT_COOKIE_PREFIXES)]
+
+
+def forget_session():
+    if os.path.exists(session_file):
+        os.remove(session_file)
+
+
+def is_logged_out(response):
+    """
+    True when Cardmarket answered with its login page instead of the requested one.
+    """
+    if "login" in response.url.lower() and response.history:
+        return True
+    # Streamed downloads are never checked by their body
+    if not getattr(response, "_content_consumed", True):
+        return False
+    return "User_Login" in response.text and "Logout" not in response.text
@@ -0,0 +1,66 @@
+import os
+import json
+import threading
+from datetime import datetime
+
+# What was downloaded and what it looked like, next to the reports themselves
+MANIFEST_FILE = os.path.join('csv_files', 'manifest.json')
+MANIFEST_VERSION = 1
+
+_lock = threading.Lock()
+
+
+def read_manifest(manifest_file=MANIFEST_FILE):
+    """
+    {filename: {"idRequest", "size", "mtime_ns", "sha256", "downloaded"}} of every known report.
+    """
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest["reports"]
+
+
+def write_manifest(reports, manifest_file=MANIFEST_FILE):
+    temp_path = manifest_file + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump({"version": MANIFEST_VERSION, "reports": reports}, file, indent=2)
+    os.replace(temp_path, manifest_file)
+
+
+def record_download(file_path, id_request, size, sha256, manifest_file=MANIFEST_FILE):
+    """
+    Add a finished download to the manifest right away, so an interrupted run keeps what it fetched.
+    Safe to call from several download threads.
+    """
+    stat = os.stat(file_path)
+    with _lock:
+        reports = read_manifest(manifest_file)
+        reports[os.path.basename(file_path)] = {
+            "idRequest": id_request,
+            "size": size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "downloaded": datetime.now().isoformat(timespec="seconds"),
+        }
+        write_manifest(reports, manifest_file)
+
+
+def is_complete(file_path, entry):
+    """
+    True when the report on disk is the one the manifest recorded. Only the size is compared,
+    a truncated or replaced download never keeps its size.
+    """
+    return entry is not None and os.path.exists(file_path) and os.path.getsize(file_path) == entry["size"]
+
+
+def known_hash(entry, stat):
+    """
+    The SHA-256 a manifest entry recorded, if the file is still exactly as downloaded (same size and mtime).
+    """
+    if entry and entry["size"] == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return entry["sha256"]
+    return None
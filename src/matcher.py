@@ -0,0 +1,60 @@
+import re
+from collections import deque
+
+# Characters that make a str.contains pattern more than a plain substring
+REGEX_SPECIAL = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+
+def is_literal_pattern(pattern: str) -> bool:
+    return not REGEX_SPECIAL.search(pattern)
+
+
+class MultiMatcher:
+    """
+    Aho-Corasick automaton over many case-insensitive literal patterns. One scan of a text
+    finds every pattern it contains, however many patterns there are.
+    """
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [set()]
+
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern.lower():
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].add(pattern_id)
+
+        # Breadth first, so the failure state of every parent is known before its children.
+        # States right below the root fail back to the root.
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] |= self.output[self.fail[next_state]]
+
+        # An empty pattern is in every text
+        self.always = set(self.output[0])
+
+    def matches(self, text: str) -> set:
+        """
+        Ids (positions in the pattern list) of all patterns found in text.
+        """
+        found = set(self.always)
+        state = 0
+        for char in text.lower():
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            found |= self.output[state]
+        return found
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+from src.search import sort_keys
+
+PAGER_HELP = 'Enter or n: next page, p: previous page, a number: go to that page, s <column> [asc]: sort again, q: quit'
+
+
+def sort_positions(values, ascending: bool) -> np.ndarray:
+    """
+    Row positions in the order of sort_values(ascending=ascending, kind="stable"), missing values last.
+    """
+    keys = sort_keys(values, ascending)
+    return np.argsort(np.where(np.isnan(keys), np.inf, keys), kind="stable")
+
+
+class ResultPager:
+    """
+    Pages through a result without copying it. Only a sort order of row positions is kept,
+    the rows of a page are taken from the frame when the page is shown.
+    keys(column) gives the values to sort by, for columns the frame itself doesn't hold.
+    """
+    def __init__(self, df: pd.DataFrame, page_size: int, keys=None):
+        self.df = df
+        self.page_size = max(page_size, 1)
+        self.keys = keys or (lambda column: df[column])
+        self.order = np.arange(len(df))
+        self.page = 0
+
+    @property
+    def pages(self) -> int:
+        return max(-(-len(self.df) // self.page_size), 1)
+
+    def sort(self, column: str, ascending: bool):
+        self.order = sort_positions(self.keys(column), ascending)
+        self.page = 0
+
+    def go(self, page: int):
+        self.page = min(max(page, 0), self.pages - 1)
+
+    def rows(self) -> pd.DataFrame:
+        start = self.page * self.page_size
+        return self.df.iloc[self.order[start:start + self.page_size]]
+
+
+def run_pager(pager: ResultPager, show):
+    """
+    Show pages until the user quits. show(rows, caption) renders the rows of one page.
+    """
+    while True:
+        start = pager.page * pager.page_size
+        show(pager.rows(), f"Page {pager.page + 1} of {pager.pages}, rows {min(start + 1, len(pager.df))}-{min(start + pager.page_size, len(pager.df))} of {len(pager.df)}")
+        try:
+            command = input("page> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            return
+
+        if command in ("", "n"):
+            if pager.page + 1 >= pager.pages:
+                print("This is the last page.")
+            pager.go(pager.page + 1)
+        elif command == "p":
+            pager.go(pager.page - 1)
+        elif command.isdigit():
+            pager.go(int(command) - 1)
+        elif command.startswith("s "):
+            column, _, order = command[2:].strip().rpartition(" ")
+            if order.lower() not in ("asc", "desc"):
+                column, order = command[2:].strip(), "desc"
+            try:
+                pager.sort(column, order.lower() == "asc")
+            except KeyError:
+                print(f"Unknown column: {column}")
+        elif command in ("q", "quit", "exit"):
+            return
+        else:
+            print(PAGER_HELP)
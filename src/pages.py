@@ -0,0 +1,100 @@
+from typing import NamedTuple, Optional
+from bs4 import BeautifulSoup, SoupStrainer
+from src.utils import report_month
+
+try:
+    import lxml.html  # Much faster than html.parser, used when it is installed
+except ImportError:
+    lxml = None
+
+DOWNLOAD_ACTION = "/en/Magic/PostGetAction/User_Reporting_DownloadReportFileFromAws"
+
+
+class DownloadEntry(NamedTuple):
+    """
+    One report on the Downloads page. Year and month are None when the filename has none.
+    """
+    filename: str
+    year: Optional[int]
+    month: Optional[int]
+    token: str
+    id_request: str
+
+
+class ReportForm(NamedTuple):
+    """
+    The hidden fields and selectable years and months ({value: label}) of the report form on the statistics page.
+    """
+    token: str
+    id_user: str
+    price_for_buyer: str
+    years: dict
+    months: dict
+
+
+def parse_downloads(html: str) -> list:
+    """
+    The reports on the Downloads page, each idRequest once, in page order.
+    """
+    if lxml:
+        document = lxml.html.fromstring(html)
+        rows = [
+            (
+                form.xpath("string(.//button)").strip(),
+                first(form.xpath('.//input[@name="__cmtkn"]/@value')),
+                first(form.xpath('.//input[@name="idRequest"]/@value')),
+            )
+            for form in document.xpath(f'//form[@action="{DOWNLOAD_ACTION}"]')
+        ]
+    else:
+        # Only the download forms are built into a tree, the rest of the page is skipped while parsing
+        soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("form", action=DOWNLOAD_ACTION))
+        rows = [
+            (
+                form.find("button").text.strip(),
+                form.find("input", {"name": "__cmtkn"})["value"],
+                form.find("input", {"name": "idRequest"})["value"],
+            )
+            for form in soup.find_all("form")
+        ]
+
+    # The page lists every report more than once
+    entries = {}
+    for filename, token, id_request in rows:
+        if id_request not in entries:
+            year, month = report_month(filename) or (None, None)
+            entries[id_request] = DownloadEntry(filename, year, month, token, id_request)
+    return list(entries.values())
+
+
+def parse_report_form(html: str) -> ReportForm:
+    if lxml:
+        document = lxml.html.fromstring(html)
+
+        def value(name):
+            return first(document.xpath(f'//input[@name="{name}"]/@value'))
+
+        def options(name):
+            return {option.get("value"): option.text_content() for option in document.xpath(f'//select[@name="{name}"]/option')}
+    else:
+        soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer(["input", "select"]))
+
+        def value(name):
+            return soup.find("input", {"name": name})["value"]
+
+        def options(name):
+            return {option["value"]: option.text for option in soup.select(f'select[name="{name}"] option')}
+
+    return ReportForm(
+        token=value("__cmtkn"),
+        id_user=value("idUser"),
+        price_for_buyer=value("priceForBuyer"),
+        years=options("year"),
+        months=options("month"),
+    )
+
+
+def first(values):
+    if not values:
+        raise ValueError("Missing a field the page is expected to have")
+    return values[0]
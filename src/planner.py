@@ -0,0 +1,164 @@
+import time
+import numpy as np
+import pandas as pd
+from src.columns import date_of_purchase_column, foil_marker
+from src.matcher import is_literal_pattern
+
+# Rows a filter is tried on to estimate how many rows it keeps
+SAMPLE_ROWS = 2000
+
+# Rough relative cost per row of every way a filter is evaluated on the remaining rows
+ROW_COSTS = {"categories": 1, "bool": 1, "equals": 1, "names": 2, "substring": 2, "regex": 6}
+
+
+class Step:
+    """
+    One filter of a plan: how it is evaluated, how many rows it was estimated to keep and,
+    once run, how many rows were left after it and how long it took.
+    """
+    def __init__(self, key, value, method, estimate, rows=None, span=None):
+        self.key = key
+        self.value = value
+        self.method = method
+        self.estimate = estimate
+        self.rows = rows  # Ascending row positions of a row index step, known while planning
+        self.span = span  # [start, stop) of a date step
+        self.remaining = None
+        self.seconds = 0.0
+
+
+def plan_filters(df: pd.DataFrame, columns: list, row_index=None) -> list:
+    """
+    The filters of columns as Steps, in the order they are run. Date ranges come first, then the
+    row index lookups, smallest first; both give their rows while planning. The others follow by cost
+    per row over the share of rows they remove, estimated on a sample, so the cheapest and most
+    selective run first. Dates have to be sorted.
+    """
+    from src.bitmaps import is_indexed
+    sample = np.unique(np.linspace(0, len(df) - 1, min(len(df), SAMPLE_ROWS)).astype(int)) if len(df) else np.arange(0)
+    date_steps, index_steps, row_steps = [], [], []
+    for column in columns:
+        for key, value in column.items():
+            start = time.perf_counter()
+            if key == date_of_purchase_column:
+                first, stop = date_range(df, value)
+                step = Step(key, value, "date range", stop - first, span=(first, stop))
+                date_steps.append(step)
+            elif row_index is not None and is_indexed(key, value):
+                rows = row_index.lookup(key, value)
+                step = Step(key, value, "row index", len(rows), rows=rows)
+                index_steps.append(step)
+            else:
+                method = row_method(df[key], value)
+                matched = row_mask(df[key].take(sample), value, method)
+                step = Step(key, value, method, round(matched.mean() * len(df)) if len(sample) else 0)
+                row_steps.append(step)
+            # Planning a step counts towards its time
+            step.seconds = time.perf_counter() - start
+
+    def rank(step):
+        kept = step.estimate / len(df) if len(df) else 0
+        return ROW_COSTS[step.method] / max(1 - kept, 1e-9)
+
+    return date_steps + sorted(index_steps, key=lambda step: step.estimate) + sorted(row_steps, key=rank)
+
+
+def run_plan(df: pd.DataFrame, steps: list) -> pd.DataFrame:
+    """
+    Run the steps of plan_filters on a shrinking array of row positions. Only the filtered columns
+    are read for the remaining rows, the frame itself is cut once at the end. Rows keep their order.
+    """
+    rows, first, stop = None, 0, len(df)
+    for step in steps:
+        start = time.perf_counter()
+        if step.span is not None:
+            # Dates are sorted, so their rows are one slice of the frame
+            first, stop = max(first, step.span[0]), max(first, min(stop, step.span[1]))
+        elif step.rows is not None:
+            found = step.rows[np.searchsorted(step.rows, first):np.searchsorted(step.rows, stop)]
+            rows = found if rows is None else np.intersect1d(rows, found, assume_unique=True)
+        else:
+            values = df[step.key].iloc[first:stop]
+            values = values if rows is None else values.take(rows - first)
+            matched = row_mask(values, step.value, step.method)
+            rows = np.flatnonzero(matched) + first if rows is None else rows[matched]
+        step.remaining = stop - first if rows is None else len(rows)
+        step.seconds += time.perf_counter() - start
+    # Taking from the date slice reads fewer of the per report pieces of a loaded frame
+    df = df.iloc[first:stop]
+    return df if rows is None else df.iloc[rows - first]
+
+
+def date_range(df: pd.DataFrame, value: str):
+    """
+    The [start, stop) row positions a date filter keeps, by binary search on the date sorted rows.
+    """
+    from src.search import parse_date_filter
+    lower, upper = parse_date_filter(value)
+    dates = df[date_of_purchase_column]
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        lower = None if lower is None else pd.Timestamp(lower)
+        upper = None if upper is None else pd.Timestamp(upper)
+    dates = dates.iloc[:dates.count()]  # Missing dates sort last and never match
+    start = 0 if lower is None else dates.searchsorted(lower, side="left")
+    stop = len(dates) if upper is None else dates.searchsorted(upper, side="right")
+    return int(start), max(int(start), int(stop))
+
+
+def row_method(series: pd.Series, value) -> str:
+    if isinstance(value, tuple):
+        # Exact names, like the matches of a fuzzy search
+        return "categories" if isinstance(series.dtype, pd.CategoricalDtype) else "names"
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return "categories"
+    if pd.api.types.is_bool_dtype(series):
+        return "bool"
+    if series.dtype == 'object' or pd.api.types.is_string_dtype(series):
+        # A plain name doesn't need the regex engine
+        return "substring" if is_literal_pattern(value) else "regex"
+    return "equals"
+
+
+def row_mask(series: pd.Series, value, method: str) -> np.ndarray:
+    if method == "categories":
+        # Match the few categories once, then pick rows by their category code
+        categories = series.cat.categories
+        if isinstance(value, tuple):
+            matches = categories.get_indexer(list(value))
+            matches = matches[matches >= 0]
+        else:
+            matches = np.flatnonzero(categories.str.contains(value, case=False, na=False))
+        return np.isin(series.cat.codes.to_numpy(), matches)
+    if method == "names":
+        return series.isin(value).to_numpy()
+    if method == "bool":
+        # The compact layout keeps the foil markers as a bool
+        return (series == (value == foil_marker)).to_numpy()
+    if method in ("substring", "regex"):
+        return series.str.contains(value, case=False, regex=method == "regex", na=False).to_numpy(dtype=bool)
+    return (series == value).to_numpy()
+
+
+def print_plan(steps: list, rows: int):
+    """
+    The plan as a table on stderr: every step with its estimated and actual rows and time.
+    """
+    from rich import box
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title=f"Filter plan over {rows} rows", box=box.SIMPLE, header_style="bold white")
+    for column in ["Step", "Filter", "Method", "Estimated rows", "Rows left", "Time (ms)"]:
+        table.add_column(column, justify="left" if column in ("Filter", "Method") else "right")
+    for number, step in enumerate(steps, 1):
+        value = ", ".join(step.value) if isinstance(step.value, tuple) else str(step.value)
+        table.add_row(
+            str(number),
+            f"{step.key}: {value}",
+            step.method,
+            str(step.estimate),
+            "" if step.remaining is None else str(step.remaining),
+            f"{step.seconds * 1000:.2f}",
+        )
+    # stderr, so the plan never mixes with results piped elsewhere
+    Console(stderr=True).print(table)
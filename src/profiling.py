@@ -0,0 +1,158 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# The profiler of the running command, None when profiling is off
+_active = None
+
+
+class Record:
+    """
+    One run of a pipeline stage. Callers may set rows to the number of rows the stage produced.
+    """
+    def __init__(self, name, depth=0):
+        self.name = name
+        self.depth = depth
+        self.rows = None
+        self.start = 0.0
+        self.seconds = 0.0
+        self.peak = 0
+
+
+class Profiler:
+    """
+    Collects wall time, rows and peak traced memory of every stage. Stages nest, a stage's peak
+    is the most memory allocated above what was in use when it started.
+    """
+    def __init__(self):
+        self.records = []
+        self.stack = []
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def measure(self, record):
+        record.depth = len(self.stack)
+        # reset_peak is shared by all stages, so hand the peak so far to the enclosing stage first
+        if self.stack:
+            self.stack[-1].peak = max(self.stack[-1].peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        self.stack.append(record)
+        record.start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - record.start
+            self.stack.pop()
+            peak = max(record.peak, tracemalloc.get_traced_memory()[1])
+            record.peak = max(peak - current, 0)
+            if self.stack:
+                self.stack[-1].peak = max(self.stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.records.append(record)
+
+    def summary(self):
+        """
+        Records with the same name and depth added up, in the order the stages started.
+        """
+        totals = {}
+        for record in sorted(self.records, key=lambda record: record.start):
+            key = (record.name, record.depth)
+            total = totals.setdefault(key, {"name": record.name, "depth": record.depth, "calls": 0, "seconds": 0.0, "rows": None, "peak": 0})
+            total["calls"] += 1
+            total["seconds"] += record.seconds
+            total["peak"] = max(total["peak"], record.peak)
+            if record.rows is not None:
+                total["rows"] = (total["rows"] or 0) + record.rows
+        return list(totals.values())
+
+    def print_summary(self):
+        from rich import box
+        from rich.console import Console
+        from rich.table import Table
+
+        table = Table(title="Profile", box=box.SIMPLE, header_style="bold white")
+        for column in ["Stage", "Calls", "Time (ms)", "Rows", "Peak memory (MB)"]:
+            table.add_column(column, justify="left" if column == "Stage" else "right")
+        for total in self.summary():
+            table.add_row(
+                "  " * total["depth"] + total["name"],
+                str(total["calls"]),
+                f"{total['seconds'] * 1000:.1f}",
+                "" if total["rows"] is None else str(total["rows"]),
+                f"{total['peak'] / 2**20:.1f}",
+            )
+        # stderr, so the profile never mixes with results piped elsewhere
+        Console(stderr=True).print(table)
+
+    def write_trace(self, path):
+        """
+        Write the stages as a Chrome trace, viewable in chrome://tracing or Perfetto.
+        """
+        import json
+        import os
+        events = [{
+            "name": record.name,
+            "ph": "X",
+            "ts": (record.start - self.origin) * 1e6,
+            "dur": record.seconds * 1e6,
+            "pid": os.getpid(),
+            "tid": 0,
+            "args": {"rows": record.rows, "peak_bytes": record.peak},
+        } for record in self.records]
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+@contextmanager
+def stage(name):
+    """
+    Measure a pipeline stage when profiling is on, costs next to nothing when it is off.
+    """
+    record = Record(name)
+    if _active is None:
+        yield record
+        return
+    with _active.measure(record):
+        yield record
+
+
+@contextmanager
+def profiling(enabled: bool, output: str = None):
+    """
+    Profile everything run inside, then print the stage summary. An output ending in .json gets
+    a Chrome trace of the stages, any other output gets the cProfile statistics for pstats.
+    Stages run in worker processes (--jobs) are only seen as part of the stage that waits for them.
+    """
+    global _active
+    if not enabled:
+        yield
+        return
+
+    profiler = Profiler()
+    function_profile = None
+    if output and not output.lower().endswith(".json"):
+        import cProfile
+        function_profile = cProfile.Profile()
+
+    tracemalloc.start()
+    _active = profiler
+    if function_profile:
+        function_profile.enable()
+    try:
+        with stage("total"):
+            yield
+    finally:
+        if function_profile:
+            function_profile.disable()
+        _active = None
+        tracemalloc.stop()
+
+        profiler.print_summary()
+        if function_profile:
+            function_profile.dump_stats(output)
+        elif output:
+            profiler.write_trace(output)
+        if output:
+            from rich.console import Console
+            Console(stderr=True).print(f"Profile written to {output}")
@@ -1,93 +1,260 @@
 import os
 import re
-from datetime import datetime
+import calendar
+import hashlib
+from datetime import date, datetime, timedelta
 import glob
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 from rich import print, box
 from rich.console import Console
 from rich.table import Table
+from src.columns import (
+    product_field, product_name_column, set_name_column, user_name_column, date_of_purchase_column,
+    total_price_column, quantity_column, order_id_column, shipment_cost_column, quality_column,
+    language_column, foiliness_column, foil_marker, non_foil_marker, original_header,
+)
+from src.cache import STRING_DTYPE, arrow_dtype
+from src.profiling import stage
+from src.utils import report_month
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 
 console = Console()
 
 
 # Specify the directory containing the CSV files
 CSV_DIRECTORY = 'csv_files'
-product_field = "Description" #"Localized Product Name"
-
-product_name_column = "Product Name"
-set_name_column = "Set Name"
-user_name_column = "Username"
-date_of_purchase_column = "Purchased"
-total_price_column = "Sum"
-quantity_column = "Qty"
-order_id_column = "OrderID"
-shipment_cost_column = "Shipment Costs"
-quality_column = "Quality"
-language_column = "Lang"
-foiliness_column = "Foil"
-
-original_header = [
-    order_id_column, user_name_column, 'Name', 'Street', 'City', 'Country', 'Is Professional', 'VAT Number', 
-    date_of_purchase_column, 'Article Count', 'Merchandise Value', shipment_cost_column, 'Trustee service fee', 
-    'Total Value', 'Currency', 'Description', 'Product ID', 'Localized Product Name'
-]
-
-def get_dataframe():
-    # Initialize an empty list to hold dataframes
-    dataframes = []
-    # Use glob to find all .csv files in the directory
-    for filename in glob.glob(os.path.join(CSV_DIRECTORY, '*.csv')):
-        file_path = os.path.join(filename)
-
-        # Read the file and rename columns
-        df = pd.read_csv(file_path, sep=';', header=0)  # You should already have the correct header from original_header
-        df.columns = original_header  # Rename columns to the standardized header
-        dataframes.append(df)
-
-    # Concatenate all dataframes into one
-    combined_df = pd.concat(dataframes, ignore_index=True)
-
-    # Rename columns
-    combined_df.rename(columns={
-        'Date of Purchase': date_of_purchase_column
-    }, inplace=True)
-
-    # Convert "Date of Purchase" to datetime and strip the time (only keep the date)
-    combined_df[date_of_purchase_column] = pd.to_datetime(combined_df[date_of_purchase_column]).dt.date
-
-
-    # Parse the product field and create a MultiIndex DataFrame
-    parsed_products = []
-    order_ids = []
-    for _, row in combined_df.iterrows():
-        product_df = parse_products(row[product_field], row["Currency"])
-
-        parsed_products.append(product_df)
-
-        # Track the order ID for MultiIndex purposes
-        order_id = row[order_id_column]
-        order_ids.extend([order_id] * len(product_df))
-
-    # Concatenate all parsed product dataframes
-    products_df = pd.concat(parsed_products, ignore_index=True)
-    products_df[order_id_column] = order_ids
-
-    # Set MultiIndex with OrderID and a sequential integer for each product entry
-    products_df = products_df.set_index([order_id_column, products_df.groupby(order_id_column).cumcount()])
-
-    # Merge parsed products back with the original DataFrame to retain other columns
-    merged_df = combined_df[original_header].drop_duplicates()
-    final_df = pd.merge(products_df, merged_df, on=order_id_column, how='left')
-
-    return final_df
+
+# Machine readable output formats of search, with the separator of the text ones
+OUTPUT_FORMATS = {"tsv": "\t", "csv": ",", "jsonl": None, "parquet": None}
+OUTPUT_CHUNK_ROWS = 10000
+
+# Rows per page of the pager when there is no limit
+PAGE_SIZE = 25
+
+def get_dataframe(jobs: int = 1, date_of_purchase: str = None):
+    # Reports are parsed one by one and cached, so only new or changed ones cost a re-parse
+    from src.cache import load_reports
+
+    with stage("load") as record:
+        df = load_reports(report_files(), read_report, jobs=jobs, include=date_include(date_of_purchase))
+        df = empty_report() if df is None else df
+        record.rows = len(df)
+    return df
+
+def rechunk(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The same frame with every Arrow backed column in one piece. A loaded frame keeps one piece per
+    report, and taking rows out of many pieces is far slower than out of one. Pays off for a frame
+    that is searched many times.
+    """
+    if df.empty:
+        return df
+    return pa.Table.from_pandas(df, preserve_index=False).combine_chunks().to_pandas(types_mapper=arrow_dtype)
+
+def get_compact_dataframe(jobs: int = 1, date_of_purchase: str = None):
+    """
+    Like get_dataframe, but as the (products, orders) pair of src.compact. Every report is
+    compacted as soon as it is loaded, so the full frame never exists all at once.
+    """
+    from src.cache import load_partitions
+    from src.compact import join_partitions, split_orders
+    with stage("load") as record:
+        parts = load_partitions(
+            report_files(), read_report, jobs=jobs, include=date_include(date_of_purchase), transform=split_orders
+        )
+        products, orders = join_partitions(parts.values() or [split_orders(empty_report())])
+        record.rows = len(products)
+    return products, orders
+
+def date_include(date_of_purchase: str = None):
+    # Skip whole reports whose month can't match the date filter
+    if not date_of_purchase:
+        return None
+    lower, upper = parse_date_filter(date_of_purchase)
+    return lambda file_path: report_may_match(file_path, lower, upper)
+
+def report_files():
+    return sorted(glob.glob(os.path.join(CSV_DIRECTORY, '*.csv')))
+
+def dataset_version(date_of_purchase: str = None) -> str:
+    """
+    Changes whenever the reports a search with this date filter loads change.
+    """
+    from src.cache import CACHE_VERSION
+    include = date_include(date_of_purchase)
+    signature = [entry for entry in report_signature() if include is None or include(entry[0])]
+    return hashlib.sha256(repr((CACHE_VERSION, signature)).encode()).hexdigest()
+
+def report_signature():
+    """
+    Name, size and mtime of every report, changes whenever a report is added, removed or rewritten.
+    """
+    signature = []
+    for file_path in report_files():
+        stat = os.stat(file_path)
+        signature.append((file_path, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+def empty_report():
+    df = pd.DataFrame(columns=[order_id_column, *parse_products("", "").columns, *original_header[1:]])
+    return df.astype({date_of_purchase_column: "datetime64[s]"})
+
+def report_may_match(file_path, lower, upper):
+    month = report_month(file_path)
+    if month is None:
+        # Not named like a Cardmarket report, it could hold any date
+        return True
+    first_day = date(month[0], month[1], 1)
+    last_day = date(month[0], month[1], calendar.monthrange(*month)[1])
+    return (lower is None or last_day >= lower) and (upper is None or first_day <= upper)
+
+def read_report_csv(file_path):
+    """
+    The rows of a report under the standardized header. The file is memory-mapped and parsed by
+    Arrow, dates included, and text columns stay Arrow backed.
+    """
+    with pa.memory_map(file_path) as source:
+        table = pa_csv.read_csv(
+            source,
+            read_options=pa_csv.ReadOptions(column_names=original_header, skip_rows=1),
+            parse_options=pa_csv.ParseOptions(delimiter=";", newlines_in_values=True),
+            # Empty fields are missing, like with pd.read_csv
+            convert_options=pa_csv.ConvertOptions(strings_can_be_null=True),
+        )
+    df = table.to_pandas(types_mapper=arrow_dtype)
+    # Columns without any value are float NaN, like with pd.read_csv
+    for field in table.schema:
+        if pa.types.is_null(field.type):
+            df[field.name] = df[field.name].astype(float)
+    return df
+
+def parse_date_filter(value):
+    """
+    Turn a date of purchase filter into inclusive (lower, upper) dates, None meaning unbounded.
+    ">YYYY-MM-DD" and "<YYYY-MM-DD" are exclusive, "YYYY-MM-DD to YYYY-MM-DD" is inclusive.
+    """
+    if value.startswith(">"):
+        return datetime.strptime(value[1:].strip(), "%Y-%m-%d").date() + timedelta(days=1), None
+    if value.startswith("<"):
+        return None, datetime.strptime(value[1:].strip(), "%Y-%m-%d").date() - timedelta(days=1)
+    if "to" in value:
+        start_date, end_date = value.split("to")
+        return (
+            datetime.strptime(start_date.strip(), "%Y-%m-%d").date(),
+            datetime.strptime(end_date.strip(), "%Y-%m-%d").date(),
+        )
+    return None, None
+
+def read_report(file_path):
+    with stage("read_csv") as record:
+        combined_df = read_report_csv(file_path)
+        record.rows = len(combined_df)
+
+    # Only the day of a purchase counts, kept as datetime64 so date filters compare whole arrays
+    with stage("parse_dates"):
+        combined_df[date_of_purchase_column] = pd.to_datetime(combined_df[date_of_purchase_column]).dt.normalize()
+
+    # A report without orders has no products to parse
+    if combined_df.empty:
+        return empty_report()
+
+    # Parse the product field of every order in one pass, the index tells which order a product came from
+    with stage("parse_products") as record:
+        products_df = parse_products_batch(combined_df[product_field], combined_df["Currency"])
+        record.rows = len(products_df)
+    with stage("attach_orders") as record:
+        # Products come out grouped by the order they belong to, so each one takes the fields of
+        # its order by position. No order has to be looked up by its ID.
+        positions = combined_df.index.get_indexer(products_df.index)
+        order_fields = combined_df[original_header].take(positions).reset_index(drop=True)
+        products_df = products_df.reset_index(drop=True)
+        final_df = pd.concat(
+            [order_fields[[order_id_column]], products_df, order_fields.drop(columns=order_id_column)], axis=1
+        )
+        record.rows = len(final_df)
+
+    # Sorted by date so date filters can binary search
+    with stage("sort_by_date"):
+        return final_df.sort_values(date_of_purchase_column, kind="stable", ignore_index=True)
+
+# E.g. 1x Myth Realized (Dragons of Tarkir) - 26 - Rare - MT - English - Foil - 4,99 EUR;
+# 1x Cabal Therapy (Premium Deck Series: Graveborn) - Uncommon - NM - English - Foil - 6,00 EUR 
+# 5x Beast Token (G 3/3) / Elemental Token (G 5/3) (Commander 2014) - T 19/21 - Token - MT - English - 0,10 EUR
+# 3x 80 KMC Hyper mat Sleeves (Black) - English - 5,99 EUR 
+
+product_split_pattern = r'\s\|\s(?![^()]*\))'  # Splits on " | " outside of parentheses
+quantity_pattern = r"(\d+)x"  # Matches quantity
+product_pattern = r" (.+?) \("  # Matches product name (up to the first '(')
+set_pattern = r'\(([^()]+)\)(?=[^()]*$)' #r"\((.*?)\)"  # Matches set name within parentheses
+quality_pattern = r'\b( - MT - | - NM - | - EX - | - GD - | - LP - | - PL - | - PO -)\b' # r"\) - \d+ - \w+ - (\w+) - "
+alternative_quality_pattern = r"\) - \w+ - (\w+) - "
+language_pattern = r'\b(English|German|French|Italian|Spanish|Japanese|Simplified Chinese|Traditional Chinese|Korean|Portuguese|Russian)\b'
+foil_pattern = r"( - Foil - )"
+price_pattern_template = r"- ([\d,.]+) {currency}"
 
 def split_products(s: str):
     return [
         p.strip()
-        for p in re.split(r'\s\|\s(?![^()]*\))', s)
+        for p in re.split(product_split_pattern, s)
         if p.strip()
     ]
 
+@lru_cache(maxsize=None)
+def product_line_regex(currency):
+    """
+    Combine every field pattern into one regex for a currency. Each field is an optional lookahead
+    from the start of the line, so its group holds the same leftmost match re.search would find.
+    """
+    fields = [
+        quantity_pattern, product_pattern, set_pattern, quality_pattern,
+        language_pattern, foil_pattern, price_pattern_template.format(currency=currency),
+    ]
+    return re.compile("^" + "".join(fr"(?=(?:[\s\S]*?{field})?)" for field in fields))
+
+def parse_products_batch(product_strs: pd.Series, currencies: pd.Series) -> pd.DataFrame:
+    """
+    Vectorized parse_products over many orders, giving the same values row for row.
+    The result has one row per product, indexed by the label of the order it came from.
+    """
+    # One product per row, same splitting as split_products
+    products = product_strs.str.split(product_split_pattern, regex=True).explode().str.strip()
+    products = products[products.notna() & (products != "")]
+    order_labels = products.index
+    currencies = currencies.astype(str).loc[order_labels].to_numpy()
+    products = products.reset_index(drop=True)
+
+    # The price pattern depends on the currency, so extract once per currency and restore the order after
+    fields = pd.concat(
+        [products[currencies == currency].str.extract(product_line_regex(currency)) for currency in pd.unique(currencies)]
+        or [products.str.extract(product_line_regex(""))]
+    ).sort_index()
+    quantity, product_name, set_name, quality, language, foil, price = (fields[i] for i in range(7))
+
+    quantities = pd.to_numeric(quantity)
+    prices = price.str.replace(",", ".", regex=False).astype(float)
+    # Like parse_products, a zero quantity or price gives no total
+    has_total = quantities.fillna(0).ne(0) & prices.fillna(0).ne(0)
+
+    parsed_df = pd.DataFrame({
+        quantity_column: quantities,
+        product_name_column: product_name.str.strip(),
+        set_name_column: set_name.str.replace("Magic: The Gathering | ", "", regex=False).str.strip(),
+        "Price": prices,
+        quality_column: quality.str.replace(" - ", "", regex=False).str.strip().fillna("N/A"),
+        foiliness_column: foil.notna().map({True: foil_marker, False: non_foil_marker}),
+        language_column: language.str.strip(),
+        total_price_column: (quantities * prices).where(has_total),
+    })
+    # The string methods give object on pandas 2, text is Arrow backed like the report's own columns
+    text_columns = [product_name_column, set_name_column, quality_column, foiliness_column, language_column]
+    parsed_df = parsed_df.astype(dict.fromkeys(text_columns, STRING_DTYPE))
+    parsed_df.index = order_labels
+    return parsed_df
+
 def parse_products(product_str, currency):
     # Split by " | " to separate individual products
     products = split_products(product_str)
@@ -95,18 +262,7 @@ def parse_products(product_str, currency):
     # Lists to store parsed data
     quantities, product_names, set_names, qualities, languages, foils, prices, total_prices = [], [], [], [], [], [], [], []
 
-    # E.g. 1x Myth Realized (Dragons of Tarkir) - 26 - Rare - MT - English - Foil - 4,99 EUR;
-    # 1x Cabal Therapy (Premium Deck Series: Graveborn) - Uncommon - NM - English - Foil - 6,00 EUR 
-    # 5x Beast Token (G 3/3) / Elemental Token (G 5/3) (Commander 2014) - T 19/21 - Token - MT - English - 0,10 EUR
-    # 3x 80 KMC Hyper mat Sleeves (Black) - English - 5,99 EUR 
-
-    quantity_pattern = r"(\d+)x"  # Matches quantity
-    product_pattern = r" (.+?) \("  # Matches product name (up to the first '(')
-    set_pattern = r'\(([^()]+)\)(?=[^()]*$)' #r"\((.*?)\)"  # Matches set name within parentheses
-    quality_pattern = quality_regex = r'\b( - MT - | - NM - | - EX - | - GD - | - LP - | - PL - | - PO -)\b' # r"\) - \d+ - \w+ - (\w+) - "
-    alternative_quality_pattern = r"\) - \w+ - (\w+) - "
-    language_pattern = r'\b(English|German|French|Italian|Spanish|Japanese|Simplified Chinese|Traditional Chinese|Korean|Portuguese|Russian)\b'
-    price_pattern = fr"- ([\d,.]+) {currency}"  # Matches price with dynamic currency
+    price_pattern = price_pattern_template.format(currency=currency)  # Matches price with dynamic currency
 
     for product in products:
         # Extract quantity
@@ -131,7 +287,7 @@ def parse_products(product_str, currency):
         language = re.search(language_pattern, product)
         languages.append(language.group(0).strip() if language else None)
         
-        foils.append("⭐" if " - Foil - " in product else "❌") #✅✖️foil.group(1).strip()
+        foils.append(foil_marker if " - Foil - " in product else non_foil_marker) #✅✖️foil.group(1).strip()
         
         # Extract price
         price = re.search(price_pattern, product)
@@ -156,9 +312,8 @@ def parse_products(product_str, currency):
     return parsed_df
 
 
-def search(product_name, set_name, user_name, date_of_purchase, foiliness, sort_by, sort_order, display_columns, limit):
+def search(product_name, set_name, user_name, date_of_purchase, foiliness, sort_by, sort_order, display_columns, limit, jobs=1, engine="pandas", compact=False, dataframe=None, orders=None, output_format="table", pager=False, fuzzy=False, explain=False):
     try:
-        dataframe = get_dataframe()
         columns = []
         match display_columns:
             case "1":
@@ -179,7 +334,7 @@ def search(product_name, set_name, user_name, date_of_purchase, foiliness, sort_
             if date_of_purchase_column not in display_columns:
                 display_columns = date_of_purchase_column + "," + display_columns
         if foiliness:
-            columns.append({foiliness_column: "⭐"})
+            columns.append({foiliness_column: foil_marker})
             if foiliness_column not in display_columns:
                 display_columns = foiliness_column + "," + display_columns
         if user_name:
@@ -195,12 +350,52 @@ def search(product_name, set_name, user_name, date_of_purchase, foiliness, sort_
             if product_name_column not in display_columns:
                 display_columns = product_name_column + "," + display_columns             
         
-        # Apply optional filtering based on product name and set name
-        filtered_df = filter_data(dataframe, columns)
-
-        # Apply sorting
-        if sort_by:
-            filtered_df = filtered_df.sort_values(by=sort_by, ascending=sort_order)
+        if (fuzzy or explain) and engine != "pandas":
+            raise ValueError("--fuzzy and --explain only work with the pandas engine")
+
+        if engine == "sqlite":
+            # Filtering, sorting and limiting all happen in one indexed query
+            from src.database import query_orders
+            with stage("query") as record:
+                filtered_df = query_orders(columns, sort_by, sort_order, -1 if pager else limit, jobs)
+                record.rows = len(filtered_df)
+        elif engine == "pandas":
+            # A long running session passes in the dataset it keeps loaded, orders come with a compact one
+            dataframe_given = dataframe is not None
+            if dataframe is None and compact:
+                dataframe, orders = get_compact_dataframe(jobs, date_of_purchase)
+            elif dataframe is None:
+                dataframe = get_dataframe(jobs, date_of_purchase)
+            if orders is not None and sort_by in orders.columns:
+                dataframe = dataframe.join(orders[[sort_by]], on=order_id_column)
+            # A dataset passed in is the full one, a loaded one may have skipped months
+            version = dataset_version(None if dataframe_given else date_of_purchase)
+            if fuzzy:
+                columns = fuzzy_columns(dataframe, columns, version)
+
+            # Apply optional filtering based on product name and set name
+            with stage("filter") as record:
+                filtered_df = filter_data(dataframe, columns, row_index(dataframe, columns, version), explain)
+                record.rows = len(filtered_df)
+
+            # Apply sorting, only the shown rows and one more to tell if there are more results
+            if sort_by and not pager:
+                with stage("sort") as record:
+                    filtered_df = top_k(filtered_df, sort_by, sort_order, limit + 1 if limit >= 0 else None)
+                    record.rows = len(filtered_df)
+        else:
+            raise ValueError(f"Unknown engine: {engine}")
+
+        if pager:
+            # The pager sorts and shows one page at a time itself
+            show_pages(filtered_df, orders, sort_by if engine == "pandas" else None, sort_order, limit, display_columns)
+            return
+
+        # The compact layout only gets its order columns back for the rows that are shown
+        if orders is not None:
+            from src.compact import expand_orders
+            with stage("expand_orders"):
+                filtered_df = expand_orders(filtered_df.head(limit + 1 if limit >= 0 else None), orders.drop(columns=sort_by, errors="ignore"))
 
         # Apply column selection
         if display_columns:
@@ -215,41 +410,217 @@ def search(product_name, set_name, user_name, date_of_purchase, foiliness, sort_
 
 
         # Format and print results
-        formatted_output(filtered_df, limit_message, limit, display_columns)
+        with stage("render") as record:
+            if output_format == "table":
+                formatted_output(filtered_df, limit_message, limit, display_columns)
+            else:
+                write_results(filtered_df, output_format)
+                if limit_message:
+                    Console(stderr=True).print(f"[yellow]Wrote the first {limit} results.[/yellow]")
+            record.rows = len(filtered_df)
     except Exception as e:
         print(e)
 
-def filter_data(df: pd.DataFrame, columns: list) -> pd.DataFrame:
-    for column in columns:
-        for key, value in column.items():
-            if key == date_of_purchase_column:
-                # Handle the date comparisons
-                if value.startswith(">"):
-                    # Greater than
-                    value = (value[1:].strip())  # Extract date from "> yyyy-mm-dd"
-                    value = datetime.strptime(value, "%Y-%m-%d").date()
-                    # df = combined_df[combined_df[key] > date_value]
-                    # df[key] = pd.to_datetime(df[key], errors='coerce').dt.date
-                    df = df[df[key] > value]
-                elif value.startswith("<"):
-                    # Less than
-                    value = (value[1:].strip())  # Extract date from "> yyyy-mm-dd"
-                    value = datetime.strptime(value, "%Y-%m-%d").date()
-                    df = df[df[key] < value]
-                elif "to" in value:
-                    # Between dates
-                    start_date, end_date = value.split("to")
-                    start_date = datetime.strptime((start_date.strip()), "%Y-%m-%d").date()
-                    end_date = datetime.strptime((end_date.strip()), "%Y-%m-%d").date()
-
-                    df = df[(df[key] >= start_date) & (df[key] <= end_date)]
-            elif df[key].dtype == 'object':  # String column
-                # Apply .str.contains for string columns
-                df = df[df[key].str.contains(value, case=False, na=False)]
-            else:
-                # For non-string columns, do a direct equality comparison
-                df = df[df[key] == value]
-    return df
+def show_pages(df: pd.DataFrame, orders, sort_by, sort_order, page_size, display_columns):
+    """
+    Browse the filtered rows page by page. Only the rows of the shown page are expanded, selected
+    and rendered, sorting again only reorders row positions.
+    """
+    from src.pager import ResultPager, run_pager
+    page_size = page_size if page_size > 0 else PAGE_SIZE
+
+    def keys(column):
+        if column in df.columns:
+            return df[column]
+        if orders is not None and column in orders.columns:
+            return orders[column].reindex(df[order_id_column]).to_numpy()
+        raise KeyError(column)
+
+    def show(rows, caption):
+        if orders is not None:
+            from src.compact import expand_orders
+            rows = expand_orders(rows, orders.drop(columns=[c for c in rows.columns if c in orders.columns]))
+        if display_columns:
+            rows = rows[[col.strip() for col in display_columns.split(',')]]
+        formatted_output(rows, False, page_size, display_columns)
+        console.print(f"[yellow]{caption}[/yellow]")
+
+    pager = ResultPager(df, page_size, keys)
+    if sort_by:
+        with stage("sort"):
+            pager.sort(sort_by, sort_order)
+    run_pager(pager, show)
+
+def batch_search(queries, set_name, user_name, date_of_purchase, foiliness, jobs=1, dataframe=None):
+    """
+    Look up many product name queries against one load of the orders and print one JSON line per query
+    with its hits, total quantity and last purchase date. The other filters apply to every query.
+    Only product columns are used, so dataframe can be the products of a compact layout as well.
+    """
+    import json
+    import sys
+    from src.matcher import MultiMatcher, is_literal_pattern
+    try:
+        columns = []
+        if date_of_purchase:
+            columns.append({date_of_purchase_column: date_of_purchase})
+        if foiliness:
+            columns.append({foiliness_column: foil_marker})
+        if user_name:
+            columns.append({user_name_column: user_name})
+        if set_name:
+            columns.append({set_name_column: set_name})
+
+        if dataframe is None:
+            dataframe = get_dataframe(jobs, date_of_purchase)
+        with stage("filter") as record:
+            df = filter_data(dataframe, columns)
+            record.rows = len(df)
+
+        # Queries are matched against the distinct names, the rows of a name are summed up once.
+        # A compact frame has categorical names, only those left after filtering count.
+        by_name = df.groupby(product_name_column, sort=False, observed=True).agg(
+            hits=(product_name_column, "size"),
+            quantity=(quantity_column, "sum"),
+            last_purchase=(date_of_purchase_column, "max"),
+        )
+        names = by_name.index.to_numpy()
+
+        with stage("match") as record:
+            # Plain names all go through one Aho-Corasick scan, regex queries are matched one by one
+            literal_ids = [i for i, query in enumerate(queries) if is_literal_pattern(query)]
+            regex_ids = set(range(len(queries))) - set(literal_ids)
+            matched = {i: [] for i in range(len(queries))}
+            if literal_ids:
+                matcher = MultiMatcher([queries[i] for i in literal_ids])
+                for position, name in enumerate(names):
+                    for pattern_id in matcher.matches(name):
+                        matched[literal_ids[pattern_id]].append(position)
+            for i in sorted(regex_ids):
+                matched[i] = np.flatnonzero(by_name.index.str.contains(queries[i], case=False, na=False)).tolist()
+            record.rows = len(queries)
+
+        for i, query in enumerate(queries):
+            rows = by_name.iloc[matched[i]]
+            quantity = rows["quantity"].sum()
+            last_purchase = rows["last_purchase"].max() if len(rows) else None
+            # Plain stdout, rich would highlight and wrap the JSON
+            sys.stdout.write(json.dumps({
+                "query": query,
+                "hits": int(rows["hits"].sum()),
+                "quantity": int(quantity) if float(quantity).is_integer() else float(quantity),
+                "last_purchase": None if pd.isna(last_purchase) else pd.Timestamp(last_purchase).strftime("%Y-%m-%d"),
+                "products": sorted(rows.index),
+            }, ensure_ascii=False) + "\n")
+    except Exception as e:
+        print(e)
+
+def read_queries(source: str) -> list:
+    """
+    One query per line from a file, or from stdin when source is "-". Blank lines and # comments are skipped.
+    """
+    import sys
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, "r", encoding="utf-8") as file:
+            lines = file.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+
+def sort_keys(values, ascending: bool) -> np.ndarray:
+    """
+    Float keys that order values like sort_values(ascending=ascending) does, NaN for missing values.
+    Shared by top_k and the pager, so both sort the same way.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        keys = values.to_numpy(dtype=float, na_value=np.nan)
+    else:
+        # Strings, dates and the like are ranked by their sorted position
+        codes = pd.factorize(values, sort=True)[0]
+        keys = np.where(codes < 0, np.nan, codes.astype(float))
+    return keys if ascending else -keys
+
+def top_k(df: pd.DataFrame, sort_by: str, ascending: bool, limit: int = None) -> pd.DataFrame:
+    """
+    Same rows as df.sort_values(sort_by, ascending=ascending, kind="stable").head(limit),
+    but only the selected rows get sorted. Ties keep their original order.
+    """
+    values = df[sort_by]
+    present = values.notna().to_numpy()
+    # Missing values sort last, if they are needed there is nothing to save
+    if limit is None or limit <= 0 or limit >= present.sum():
+        return df.sort_values(by=sort_by, ascending=ascending, kind="stable").head(limit)
+
+    candidates = np.flatnonzero(present)
+    keys = sort_keys(values, ascending)[candidates]
+
+    # Everything below the kth key is in, ties on it are taken in their original order
+    kth = np.partition(keys, limit - 1)[limit - 1]
+    below = np.flatnonzero(keys < kth)
+    ties = np.flatnonzero(keys == kth)[:limit - len(below)]
+    chosen = np.concatenate([below, ties])
+    chosen = chosen[np.argsort(keys[chosen], kind="stable")]
+    return df.iloc[candidates[chosen]]
+
+def fuzzy_columns(df: pd.DataFrame, columns: list, version: str) -> list:
+    """
+    Replace the product and set name filters by the tuple of names most similar to them. The names
+    are looked up in trigram indexes over the distinct names, persisted in the cache per dataset version.
+    """
+    from src.cache import CACHE_DIRECTORY
+    from src.fuzzy import load_index
+    fuzzy_keys = [product_name_column, set_name_column]
+
+    def distinct(key):
+        if isinstance(df[key].dtype, pd.CategoricalDtype):
+            return lambda: df[key].cat.categories
+        return lambda: df[key].dropna().unique()
+
+    with stage("fuzzy") as record:
+        indexes = load_index(CACHE_DIRECTORY, version, {key: distinct(key) for key in fuzzy_keys})
+        fuzzy_filters = []
+        for column in columns:
+            column = dict(column)
+            for key in fuzzy_keys:
+                if key in column:
+                    matches = indexes[key].lookup(column[key])
+                    column[key] = tuple(name for name, _ in matches)
+                    # On stderr, so the output formats stay clean
+                    Console(stderr=True).print(
+                        f"[yellow]{key} matches: {', '.join(f'{name} ({similarity:.2f})' for name, similarity in matches) or 'none'}[/yellow]"
+                    )
+            fuzzy_filters.append(column)
+        record.rows = sum(len(value) for column in fuzzy_filters for value in column.values() if isinstance(value, tuple))
+    return fuzzy_filters
+
+def row_index(df: pd.DataFrame, columns: list, version: str):
+    """
+    The persisted RowIndex of the dataset, None when no filter can use it.
+    """
+    from src.bitmaps import is_indexed, load_row_index
+    from src.cache import CACHE_DIRECTORY
+    if not any(is_indexed(key, value) for column in columns for key, value in column.items()):
+        return None
+    with stage("row_index"):
+        return load_row_index(CACHE_DIRECTORY, version, df)
+
+def filter_data(df: pd.DataFrame, columns: list, row_index=None, explain: bool = False) -> pd.DataFrame:
+    """
+    The rows matching every filter in columns, in their original order. The filters are planned
+    by src.planner, explain prints the plan with the rows and time of every step.
+    """
+    from src.planner import plan_filters, print_plan, run_plan
+    if any(date_of_purchase_column in column for column in columns) and not df[date_of_purchase_column].is_monotonic_increasing:
+        # Date filters binary search the date sorted rows, sorting moves the rows the index points at
+        df = df.sort_values(date_of_purchase_column, kind="stable")
+        row_index = None
+
+    steps = plan_filters(df, columns, row_index)
+    filtered_df = run_plan(df, steps)
+    if explain:
+        print_plan(steps, len(df))
+    return filtered_df
 
 def formatted_output(df: pd.DataFrame, limit_message: bool, limit: int, display_columns: str):
     console = Console()
@@ -259,20 +630,18 @@ def formatted_output(df: pd.DataFrame, limit_message: bool, limit: int, display_
         "Set Name": 35,
     }
 
-    def truncate_value(value, max_length):
-        if isinstance(value, str) and len(value) > max_length:
-            return value[: max_length - 1] + "-"
-        return value
-
     if df.empty:
         console.print("[bold red]No results found.[/bold red]")
         return
 
-    # Apply truncation
-    df = df.copy()
+    # Stringify and truncate whole columns at once, missing values show as empty cells
+    if date_of_purchase_column in df.columns:
+        df = df.assign(**{date_of_purchase_column: pd.to_datetime(df[date_of_purchase_column]).dt.strftime("%Y-%m-%d")})
+    cells = df.astype(object).where(df.notna(), "").astype(str)
     for column, max_length in TRUNCATE_COLUMNS.items():
-        if column in df.columns:
-            df[column] = df[column].apply(lambda x: truncate_value(x, max_length))
+        if column in cells.columns:
+            values = cells[column]
+            cells[column] = values.where(values.str.len() <= max_length, values.str.slice(0, max_length - 1) + "-")
 
     table = Table(
         show_header=True,
@@ -287,10 +656,41 @@ def formatted_output(df: pd.DataFrame, limit_message: bool, limit: int, display_
         table.add_column(col, style=style, overflow="fold")
 
     # Add rows
-    for _, row in df.iterrows():
-        table.add_row(*[str(v) if v is not None else "" for v in row.values])
+    for row in cells.to_numpy().tolist():
+        table.add_row(*row)
 
     console.print(table)
 
     if limit_message:
-        console.print(f"[yellow]Showing the first {limit} results.[/yellow]")
\ No newline at end of file
+        console.print(f"[yellow]Showing the first {limit} results.[/yellow]")
+
+def write_results(df: pd.DataFrame, output_format: str):
+    """
+    Write the results to stdout as tsv, csv, jsonl or parquet, for other tools to read.
+    Text formats are written in chunks, so even large results never exist as one big string.
+    """
+    import sys
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown format: {output_format}, use one of table, {', '.join(OUTPUT_FORMATS)}")
+
+    df = df.reset_index(drop=True)
+    if date_of_purchase_column in df.columns:
+        # Plain ISO dates whatever the layout keeps them as
+        df[date_of_purchase_column] = pd.to_datetime(df[date_of_purchase_column]).dt.strftime("%Y-%m-%d")
+
+    if output_format == "parquet":
+        if sys.stdout.isatty():
+            raise ValueError("Parquet is binary, redirect the output to a file")
+        sys.stdout.flush()
+        df.to_parquet(sys.stdout.buffer, index=False)
+        sys.stdout.buffer.flush()
+        return
+
+    for start in range(0, max(len(df), 1), OUTPUT_CHUNK_ROWS):
+        chunk = df.iloc[start:start + OUTPUT_CHUNK_ROWS]
+        if output_format == "jsonl":
+            if len(chunk):
+                sys.stdout.write(chunk.to_json(orient="records", lines=True, force_ascii=False))
+        else:
+            chunk.to_csv(sys.stdout, sep=OUTPUT_FORMATS[output_format], index=False, header=start == 0, lineterminator="\n")
+    sys.stdout.flush()
@@ -0,0 +1,88 @@
+import shlex
+import typer
+try:
+    # Recent typer releases ship their own copy of click and raise its exceptions
+    from typer._click.exceptions import UsageError
+except ImportError:
+    from click.exceptions import UsageError
+from src.profiling import profiling
+from src.search import batch_search, get_compact_dataframe, get_dataframe, read_queries, rechunk, report_signature, search
+
+EXIT_COMMANDS = {"exit", "quit", "q"}
+
+
+class WarmDataset:
+    """
+    Keeps the order frame in memory and only reloads it when a report in csv_files changes.
+    In compact mode the separate order table is kept as well.
+    """
+    def __init__(self, jobs: int = 1, compact: bool = False):
+        self.jobs = jobs
+        self.compact = compact
+        self.signature = None
+        self.dataframe = None
+        self.orders = None
+
+    def get(self):
+        signature = report_signature()
+        if signature != self.signature:
+            if self.compact:
+                self.dataframe, self.orders = get_compact_dataframe(self.jobs)
+            else:
+                self.dataframe = rechunk(get_dataframe(self.jobs))
+            self.signature = signature
+        return self.dataframe, self.orders
+
+
+def run_shell(search_command, jobs: int = 1, compact: bool = False):
+    """
+    Read search options line by line and answer them from a dataset that stays loaded.
+    search_command is the click command behind "mkm search", it parses every line.
+    """
+    try:
+        import readline  # noqa: F401  Line editing and history where available
+    except ImportError:
+        pass
+
+    dataset = WarmDataset(jobs, compact)
+    print("Loading orders...")
+    dataset.get()
+    print('Type search options, e.g. -p "Rad" -s "Universes". "help" shows all options, "exit" quits.')
+
+    while True:
+        try:
+            line = input("mkm> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            return
+        if not line:
+            continue
+        if line in EXIT_COMMANDS:
+            return
+
+        try:
+            args = ["--help" if arg in ("-h", "help") else arg for arg in shlex.split(line)]
+            with search_command.make_context("search", args) as ctx:
+                params = dict(ctx.params)
+        except typer.Exit:
+            continue  # --help was printed
+        except UsageError as e:
+            print(e.format_message())
+            continue
+        except ValueError as e:
+            print(e)  # Unbalanced quotes
+            continue
+
+        params.pop("jobs", None)
+        params.pop("compact", None)
+        queries = params.pop("queries", None)
+        with profiling(params.pop("profile", False), params.pop("profile_output", None)):
+            dataframe, orders = dataset.get()
+            if queries:
+                # The batch mode only needs product columns, so the compact products do as well
+                batch_search(
+                    read_queries(queries), params["set_name"], params["user_name"], params["date_of_purchase"],
+                    params["foiliness"], jobs, dataframe,
+                )
+                continue
+            search(**params, jobs=jobs, compact=compact, dataframe=dataframe, orders=orders)
@@ -0,0 +1,187 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# One request every 10 seconds on average, the pace the fixed request delays used to keep
+DEFAULT_RATE = 6.0  # Requests per minute
+DEFAULT_JITTER = 2.0  # Up to this many seconds are added to every wait
+
+# Waits after a throttled response, doubling on every one in a row
+BASE_BACKOFF = 15.0
+MAX_BACKOFF = 600.0
+MAX_RETRIES = 3
+
+# Pages Cloudflare serves instead of the real one while it checks the client
+CHALLENGE_MARKERS = ("Just a moment...", "cf-chl-", "challenge-platform")
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket. Tokens refill at `rate` per second up to `capacity`, every request
+    takes one. A caller that finds the bucket empty reserves the next token and sleeps until it is
+    due, so waiting callers are served in order and the long-run rate never exceeds `rate`.
+    """
+    def __init__(self, rate: float, capacity: float = 1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("The rate must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = capacity
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take a token, waiting for it when needed. Returns the seconds waited.
+        """
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            # A negative balance is the queue of callers waiting ahead of this one
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+class RateController:
+    """
+    Paces requests to Cardmarket. Healthy responses keep the pace at `rate` requests per minute
+    plus some jitter. A 429, a 503 or a Cloudflare challenge pauses every request for the
+    Retry-After the server asked for, or an exponential backoff when it didn't say, and the
+    request is tried again. Clock, sleep and random are injectable so the pacing can be run
+    without waiting.
+    """
+    def __init__(self, rate: float = DEFAULT_RATE, jitter: float = DEFAULT_JITTER, base_backoff: float = BASE_BACKOFF,
+                 max_backoff: float = MAX_BACKOFF, max_retries: int = MAX_RETRIES,
+                 clock=time.monotonic, sleep=time.sleep, random=random.random):
+        self.jitter = jitter
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+        self.clock = clock
+        self._sleep = sleep
+        self.random = random
+        self.bucket = TokenBucket(rate / 60, clock=clock, sleep=self.sleep)
+        self.lock = threading.Lock()
+        self.blocked_until = 0.0
+        self.backoff_level = 0
+        self.counters = {"requests": 0, "throttled": 0, "retries": 0, "slept": 0.0, "latency": 0.0}
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.counters["slept"] += seconds
+        self._sleep(seconds)
+
+    def acquire(self):
+        """
+        Wait until the next request may start.
+        """
+        with self.lock:
+            wait = self.blocked_until - self.clock()
+        if wait > 0:
+            self.sleep(wait)
+        self.bucket.acquire()
+        if self.jitter:
+            self.sleep(self.random() * self.jitter)
+
+    def record(self, response, latency: float = 0.0) -> bool:
+        """
+        Feed a response back, returns True when it was throttled and the request should be tried again.
+        """
+        throttled = is_throttled(response)
+        with self.lock:
+            self.counters["requests"] += 1
+            self.counters["latency"] += latency
+            if not throttled:
+                self.backoff_level = max(self.backoff_level - 1, 0)
+                return False
+
+            self.counters["throttled"] += 1
+            backoff = min(self.base_backoff * 2 ** self.backoff_level, self.max_backoff)
+            self.backoff_level += 1
+            delay = retry_after(response)
+            # Everyone waits, not just the request that was turned away
+            self.blocked_until = max(self.blocked_until, self.clock() + (backoff if delay is None else delay))
+            return True
+
+    def request(self, send, *args, **kwargs):
+        """
+        Call send(*args, **kwargs), e.g. session.get, paced and retried. The last response is
+        returned even when it is still throttled, for the caller to handle.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            start = self.clock()
+            response = send(*args, **kwargs)
+            if not self.record(response, self.clock() - start) or attempt == self.max_retries:
+                return response
+            with self.lock:
+                self.counters["retries"] += 1
+            response.close()
+
+    def summary(self) -> str:
+        counters = self.counters
+        average = counters["latency"] / counters["requests"] if counters["requests"] else 0.0
+        return (
+            f"{counters['requests']} requests, {counters['throttled']} throttled, {counters['retries']} retried, "
+            f"{counters['slept']:.1f} s waited, {average:.2f} s average response time"
+        )
+
+
+class ThrottledSession:
+    """
+    A requests session whose requests all go through one RateController, safe to share between threads.
+    Everything else (cookies, headers) is the wrapped session's.
+    """
+    def __init__(self, session, controller: RateController = None):
+        self.session = session
+        self.controller = controller or RateController()
+
+    def get(self, url, **kwargs):
+        return self.controller.request(self.session.get, url, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        return self.controller.request(self.session.post, url, data=data, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def is_throttled(response) -> bool:
+    if response.status_code in (429, 503):
+        return True
+    if response.status_code == 403:
+        if response.headers.get("cf-mitigated") == "challenge":
+            return True
+        # Leave streamed bodies unread, the header has to do for those
+        if not getattr(response, "_content_consumed", True):
+            return False
+        return any(marker in response.text for marker in CHALLENGE_MARKERS)
+    return False
+
+
+def retry_after(response):
+    """
+    Seconds from the Retry-After header, given either as seconds or as an HTTP date. None without one.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
@@ -0,0 +1,86 @@
+import os
+import re
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CONCURRENCY = 2
+
+# Reports are streamed to disk in chunks of this size, so memory stays flat however large they are
+CHUNK_SIZE = 1 << 16
+PART_SUFFIX = ".part"
+
+
+def download_files(session, url: str, transfers: list, concurrency: int = DEFAULT_CONCURRENCY, on_saved=None) -> dict:
+    """
+    POST every (file_path, payload) in transfers to url and save the response bodies, running up to
+    `concurrency` transfers at a time. Pacing is up to the session, with a ThrottledSession the wait
+    for the next request overlaps with the transfers still running. on_saved(file_path, payload, size, sha256)
+    is called as soon as a file is complete. Returns {file_path: saved}.
+    """
+    def transfer(file_path, payload):
+        filename = os.path.basename(file_path)
+        try:
+            size, sha256 = stream_to_file(session, url, payload, file_path)
+        except Exception as e:
+            print(f"Failed to download {filename}: {e}")
+            return False
+        if on_saved:
+            on_saved(file_path, payload, size, sha256)
+        print(f"Downloaded {filename}")
+        return True
+
+    # requests sessions share their connection pool and cookie jar safely between threads
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {file_path: executor.submit(transfer, file_path, payload) for file_path, payload in transfers}
+        return {file_path: future.result() for file_path, future in futures.items()}
+
+
+def stream_to_file(session, url: str, payload: dict, file_path: str):
+    """
+    Stream a response body into a .part file next to file_path in chunks and move it into place once complete,
+    so file_path only ever holds a whole report. A .part left by an interrupted transfer is continued
+    with a Range request when the server supports it. Returns (size, sha256) of the file.
+    """
+    part_path = partial_path(file_path, payload)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    # Ranges count raw bytes, so a continued transfer asks for the body uncompressed
+    headers = {"Range": f"bytes={offset}-", "Accept-Encoding": "identity"} if offset else None
+
+    with session.post(url, data=payload, headers=headers, stream=True) as response:
+        if response.status_code == 206 and range_start(response) == offset:
+            mode = "ab"
+        elif response.status_code == 200:
+            # The whole body again, whatever was there before
+            mode, offset = "wb", 0
+        else:
+            raise RuntimeError(f"HTTP {response.status_code}")
+
+        sha256 = hashlib.sha256()
+        if offset:
+            with open(part_path, "rb") as file:
+                for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                    sha256.update(chunk)
+
+        size = offset
+        with open(part_path, mode) as file:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                file.write(chunk)
+                sha256.update(chunk)
+                size += len(chunk)
+
+    expected = response.headers.get("Content-Length")
+    if expected is not None and mode == "wb" and not response.headers.get("Content-Encoding") and int(expected) != size:
+        raise RuntimeError(f"Got {size} of {expected} bytes")
+    os.replace(part_path, file_path)
+    return size, sha256.hexdigest()
+
+
+def partial_path(file_path: str, payload: dict) -> str:
+    # One partial file per requested report, so a .part is only ever continued with the same report
+    return f"{file_path}.{payload.get('idRequest', 'download')}{PART_SUFFIX}"
+
+
+def range_start(response):
+    # "bytes 100-999/1000" -> 100
+    match = re.match(r"bytes (\d+)-", response.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
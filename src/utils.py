@@ -1,9 +1,34 @@
-def request_delay(min_seconds: float = 8.0, max_seconds: float = 12.0) -> float:
-    import random
-    mean = (min_seconds + max_seconds) / 2
-    std_dev = (max_seconds - min_seconds) / 6  # 99.7% within range in normal dist
+def parallel_map(function, items, jobs: int = 1) -> list:
+    """
+    Map over items with up to `jobs` worker processes, 0 means one per CPU. Results keep the order of items.
+    Runs in this process when there is only one job or one item.
+    """
+    items = list(items)
+    if jobs == 1 or len(items) < 2:
+        return [function(item) for item in items]
 
-    while True:
-        delay = random.normalvariate(mean, std_dev)
-        if min_seconds <= delay <= max_seconds:
-            return round(delay, 3)
\ No newline at end of file
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+    workers = min(jobs or os.cpu_count() or 1, len(items))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, items))
+
+def file_hash(file_path) -> str:
+    import hashlib
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def report_month(file_path):
+    """
+    The (year, month) encoded in a report filename like "...-byPurchaseDate-YYYY-MM...", None if there is none.
+    """
+    import os
+    import re
+    match = re.search(r"-byPurchaseDate-(\d{4})-(\d{1,2})(?!\d)", os.path.basename(file_path))
+    if not match:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    return (year, month) if 1 <= month <= 12 else None
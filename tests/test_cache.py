@@ -0,0 +1,21 @@
+import numpy as np
+from src.cache import load_arrays, save_arrays
+
+
+def test_arrays_round_trip_for_their_version_only(tmp_path):
+    path = str(tmp_path / "index" / "names.npz")
+    assert load_arrays(path, "1") is None
+    save_arrays(path, "1", {"a.names": np.asarray(["x", "y"]), "length": np.asarray(2)})
+
+    arrays = load_arrays(path, "1")
+    assert sorted(arrays) == ["a.names", "length"]
+    assert arrays["a.names"].tolist() == ["x", "y"] and int(arrays["length"]) == 2
+    assert load_arrays(path, "2") is None
+    # Nothing is left next to the file
+    assert [p.name for p in (tmp_path / "index").iterdir()] == ["names.npz"]
+
+
+def test_unreadable_file_is_no_arrays(tmp_path):
+    path = tmp_path / "rows.npz"
+    path.write_bytes(b"not an npz file")
+    assert load_arrays(str(path), "1") is None
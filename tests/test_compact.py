@@ -0,0 +1,20 @@
+import pandas as pd
+from benchmarks.synthetic import generate
+from src import search
+from src.columns import total_price_column
+from src.compact import expand_orders, join_partitions, split_orders
+
+
+def test_expand_orders_keeps_prices_exact(tmp_path):
+    frames = [search.read_report(report) for report in generate(str(tmp_path), months=3, orders_per_month=200)]
+    expected = pd.concat(frames, ignore_index=True)
+    products, orders = join_partitions(split_orders(frame) for frame in frames)
+    expanded = expand_orders(products, orders)
+
+    for column in ["Price", total_price_column]:
+        pd.testing.assert_series_equal(expanded[column], expected[column], check_exact=True)
+    # Sorting by Sum gives the rows in the same order in both layouts
+    pd.testing.assert_index_equal(
+        products[total_price_column].sort_values(kind="stable").index,
+        expected[total_price_column].sort_values(kind="stable").index,
+    )
@@ -0,0 +1,74 @@
+import os
+import src.cache
+import src.login
+from src import downloads
+from src.manifest import read_manifest
+from src.pages import DownloadEntry
+
+FILENAME = "mkm-purchases-byPurchaseDate-2024-05.csv"
+
+
+class FakeController:
+    def summary(self):
+        return ""
+
+
+class FakeScraper:
+    controller = FakeController()
+
+
+def listed(*id_requests):
+    return [DownloadEntry(FILENAME, 2024, 5, "token", id_request) for id_request in id_requests]
+
+
+def run_download(monkeypatch, reports):
+    """
+    Run download_reports against a Downloads page listing reports, return the idRequests it downloaded.
+    """
+    downloaded = []
+
+    def download_files(session, url, transfers, concurrency, on_saved):
+        for file_path, payload in transfers:
+            body = f"report {payload['idRequest']}".encode()
+            with open(file_path, "wb") as file:
+                file.write(body)
+            on_saved(file_path, payload, len(body), "hash")
+            downloaded.append(payload["idRequest"])
+        return {file_path: True for file_path, _ in transfers}
+
+    monkeypatch.setattr(src.login, "login", lambda controller=None: FakeScraper())
+    monkeypatch.setattr(downloads, "list_downloads", lambda scraper: reports)
+    monkeypatch.setattr(downloads, "download_files", download_files)
+    downloads.download_reports()
+    return downloaded
+
+
+def test_newest_reports_keeps_the_highest_request_per_filename():
+    reports = listed("1001", "1002") + [DownloadEntry("other.csv", 2024, 4, "token", "900")]
+    assert [report.id_request for report in downloads.newest_reports(reports)] == ["1002", "900"]
+
+
+def test_two_requests_for_the_same_month_download_the_newest_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Listed in either order, the newer request is the one kept, and later runs leave it alone
+    for reports in (listed("1001", "1002"), listed("1002", "1001"), listed("1001", "1002")):
+        downloaded = run_download(monkeypatch, reports)
+        assert downloaded in ([], ["1002"])
+    assert read_manifest()[FILENAME]["idRequest"] == "1002"
+    with open(os.path.join(downloads.CSV_DIR, FILENAME), "rb") as file:
+        assert file.read() == b"report 1002"
+
+
+def test_second_run_downloads_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert run_download(monkeypatch, listed("1001", "1002")) == ["1002"]
+    assert run_download(monkeypatch, listed("1002", "1001")) == []
+    assert run_download(monkeypatch, listed("1001", "1002")) == []
+
+
+def test_ingest_reports_parses_with_jobs(monkeypatch):
+    calls = []
+    monkeypatch.setattr(src.cache, "load_partitions", lambda file_paths, read_report, **options: calls.append(options))
+    downloads.ingest_reports(["csv_files/report.csv"], jobs=4)
+    assert calls[0]["jobs"] == 4
+    assert calls[0]["include"]("csv_files/report.csv") and not calls[0]["include"]("csv_files/other.csv")
@@ -0,0 +1,50 @@
+import time
+from requests.cookies import RequestsCookieJar
+from src import login
+
+HOUR = 60 * 60
+
+
+class FakeScraper:
+    def __init__(self, **lifetimes):
+        # name=seconds left, None for a cookie without an expiry
+        self.cookies = RequestsCookieJar()
+        for name, seconds in lifetimes.items():
+            expires = None if seconds is None else int(time.time() + seconds)
+            self.cookies.set(name, "value", domain=".cardmarket.com", path="/", expires=expires)
+
+
+def test_bot_cookies_dont_shorten_the_session(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scraper = FakeScraper(PHPSESSID=None, __cf_bm=30 * 60, cf_clearance=30 * 60, _cfuvid=None)
+    login.save_session(scraper)
+    assert login.is_session_trusted(scraper)
+
+    # Cloudflare's cookies running out leaves the login alone
+    for cookie in scraper.cookies:
+        if cookie.name != "PHPSESSID":
+            cookie.expires = int(time.time() - 1)
+    assert login.is_session_trusted(scraper)
+
+
+def test_expired_session_cookie_ends_the_session(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scraper = FakeScraper(PHPSESSID=HOUR, __cf_bm=30 * 60)
+    login.save_session(scraper)
+    assert login.is_session_trusted(scraper)
+
+    monkeypatch.setattr(login.time, "time", lambda: time.time_ns() / 1e9 + 2 * HOUR)
+    assert not login.is_session_trusted(scraper)
+
+
+def test_session_is_trusted_for_the_ttl_only(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scraper = FakeScraper(PHPSESSID=None)
+    login.save_session(scraper)
+    monkeypatch.setattr(login.time, "time", lambda: time.time_ns() / 1e9 + login.SESSION_TTL + 1)
+    assert not login.is_session_trusted(scraper)
+
+
+def test_session_cookies_leave_out_cloudflare():
+    scraper = FakeScraper(PHPSESSID=None, __cf_bm=60, cf_clearance=60, _cfuvid=None, __cflb=60)
+    assert [cookie.name for cookie in login.session_cookies(scraper)] == ["PHPSESSID"]
@@ -0,0 +1,28 @@
+import pytest
+from src.search import date_include
+from src.utils import report_month
+
+STANDARD = "csv_files/mkm-purchases-byPurchaseDate-2024-01.csv"
+
+
+@pytest.mark.parametrize("file_path, month", [
+    # The name the Downloads page gives a report, the month is right before ".csv"
+    (STANDARD, (2024, 1)),
+    ("mkm-purchases-byPurchaseDate-2024-12.csv", (2024, 12)),
+    ("mkm-purchases-byPurchaseDate-2024-5-123456.csv", (2024, 5)),
+    ("mkm-purchases-byPurchaseDate-2024-13.csv", None),
+    ("mkm-purchases-byPurchaseDate-2024-123.csv", None),
+    ("orders.csv", None),
+])
+def test_report_month(file_path, month):
+    assert report_month(file_path) == month
+
+
+def test_date_filter_skips_standard_report_names_outside_it():
+    assert not date_include(">2024-03-01")(STANDARD)
+    assert not date_include("<2023-12-31")(STANDARD)
+    assert date_include("2023-12-15 to 2024-01-01")(STANDARD)
+    assert date_include("2024-01-31")(STANDARD)
+    # A file that isn't named like a report could hold any date
+    assert date_include(">2024-03-01")("csv_files/orders.csv")
+    assert date_include(None) is None
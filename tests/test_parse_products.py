@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+from benchmarks.synthetic import generate
+from src import search
+from src.columns import product_field
+
+
+def parse_one_by_one(product_strs: pd.Series, currencies: pd.Series) -> pd.DataFrame:
+    # parse_products on every order, labelled with the order like parse_products_batch does
+    rows, labels = [], []
+    for label, product_str, currency in zip(product_strs.index, product_strs, currencies):
+        parsed = search.parse_products(product_str, currency)
+        rows.extend(parsed.to_dict("records"))
+        labels.extend([label] * len(parsed))
+    return pd.DataFrame(rows, index=labels, columns=search.parse_products("", "").columns)
+
+
+def assert_same_products(product_strs, currencies):
+    product_strs, currencies = pd.Series(product_strs), pd.Series(currencies)
+    batch = search.parse_products_batch(product_strs, currencies)
+    expected = parse_one_by_one(product_strs, currencies)
+    # The values have to match exactly, the dtypes are the batch parser's
+    pd.testing.assert_frame_equal(batch, expected.astype(batch.dtypes.to_dict()), check_exact=True)
+
+
+def test_synthetic_reports(tmp_path):
+    for report in generate(str(tmp_path), months=24, orders_per_month=50):
+        df = search.read_report_csv(report)
+        assert_same_products(df[product_field], df["Currency"])
+
+
+@pytest.mark.parametrize("product_str", [
+    # Several products, with " | " inside parentheses that must not split them
+    "1x Myth Realized (Dragons of Tarkir) - 26 - Rare - MT - English - Foil - 4,99 EUR | "
+    "2x Cabal Therapy (Magic: The Gathering | Premium Deck Series: Graveborn) - Uncommon - NM - English - 6,00 EUR",
+    "5x Beast Token (G 3/3) / Elemental Token (G 5/3) (Commander 2014) - T 19/21 - Token - MT - English - 0,10 EUR",
+    "3x 80 KMC Hyper mat Sleeves (Black) - English - 5,99 EUR",
+    # No total without a quantity or price
+    "0x Lightning Bolt (Magic 2010) - 146 - Common - NM - German - 0,50 EUR",
+    "1x Lightning Bolt (Magic 2010) - 146 - Common - NM - German - 0,00 EUR",
+    # Missing fields
+    "Lightning Bolt (Magic 2010)",
+    "1x Lightning Bolt - 0,50 EUR",
+    "1x Lightning Bolt (Magic 2010) - 146 - Common - NM - Klingon - 0,50 USD",
+    "",
+    " | ",
+])
+def test_edge_cases(product_str):
+    # Next to a plain order, so an order without products still has to keep the labels in line
+    assert_same_products([product_str, "1x Opt (Ixalan) - 65 - Common - NM - English - 0,02 EUR", product_str], ["EUR"] * 3)
@@ -0,0 +1,22 @@
+import pandas as pd
+from benchmarks.read_report import old_read_report
+from benchmarks.synthetic import generate
+from src import search
+from src.cache import STRING_DTYPE, load_reports
+from src.columns import language_column, product_name_column, set_name_column, user_name_column
+
+TEXT_COLUMNS = [user_name_column, "Country", "Currency", product_name_column, set_name_column, language_column]
+
+
+def test_text_columns_are_arrow_backed(tmp_path):
+    reports = generate(str(tmp_path), months=2, orders_per_month=50)
+    cache_directory = str(tmp_path / ".cache")
+    # Parsed, then read back from the cache
+    for df in (load_reports(reports, search.read_report, cache_directory), load_reports(reports, search.read_report, cache_directory)):
+        assert [df[column].dtype for column in TEXT_COLUMNS] == [STRING_DTYPE] * len(TEXT_COLUMNS)
+
+
+def test_read_report_matches_the_merge(tmp_path):
+    # The order fields used to be merged on by OrderID after dropping duplicate orders
+    for report in generate(str(tmp_path), months=24, orders_per_month=50):
+        pd.testing.assert_frame_equal(search.read_report(report), old_read_report(report))
@@ -0,0 +1,37 @@
+import json
+import pytest
+from typer.main import get_command
+import mkm
+from benchmarks.synthetic import generate
+from src import search, shell
+
+
+@pytest.fixture
+def reports(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generate("csv_files", months=3, orders_per_month=50)
+    (tmp_path / "queries.txt").write_text("bolt\nsol ring\n", encoding="utf-8")
+
+
+def answers(output):
+    return [json.loads(line) for line in output.splitlines() if line.startswith("{")]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_queries_reuse_the_loaded_dataset(reports, monkeypatch, capsys, compact):
+    search.batch_search(["bolt", "sol ring"], None, None, None, True)
+    expected = answers(capsys.readouterr().out)
+
+    loads = []
+    for module in (search, shell):
+        for name in ("get_dataframe", "get_compact_dataframe"):
+            load = getattr(module, name)
+            monkeypatch.setattr(module, name, lambda *args, load=load: loads.append(args) or load(*args))
+    lines = iter(["-q queries.txt -f"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(lines, "exit"))
+    shell.run_shell(get_command(mkm.app).commands["search"], compact=compact)
+
+    # Loaded when the shell starts, never again for a line
+    assert len(loads) == 1
+    assert answers(capsys.readouterr().out) == expected
+    assert len(expected) == 2 and expected[0]["hits"] > 0
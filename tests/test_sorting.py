@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import generate
+from src import search
+from src.columns import date_of_purchase_column, product_name_column, quantity_column, set_name_column, total_price_column
+from src.compact import join_partitions, split_orders
+from src.pager import sort_positions
+
+rng = np.random.default_rng(1)
+SIZE = 500
+
+
+def with_missing(values):
+    values = pd.Series(values)
+    return values.mask(rng.random(SIZE) < 0.1)
+
+
+COLUMNS = {
+    "float": with_missing(rng.integers(0, 50, SIZE) / 4),
+    "int": pd.Series(rng.integers(0, 20, SIZE)),
+    "cents": with_missing(rng.integers(0, 50, SIZE)).astype("Int32"),
+    "str": with_missing(rng.choice(["Opt", "Bolt", "bolt", "Ponder", "Ægis"], SIZE)).astype("str"),
+    "date": with_missing(pd.to_datetime("2024-01-01") + pd.to_timedelta(rng.integers(0, 30, SIZE), unit="D")),
+    "category": with_missing(rng.choice(["NM", "EX", "GD"], SIZE)).astype(pd.CategoricalDtype(["NM", "EX", "GD"], ordered=True)),
+    "bool": pd.Series(rng.random(SIZE) < 0.5),
+}
+
+
+@pytest.mark.parametrize("ascending", [True, False])
+@pytest.mark.parametrize("column", COLUMNS)
+def test_pager_sorts_like_a_stable_sort(column, ascending):
+    values = COLUMNS[column]
+    expected = values.sort_values(ascending=ascending, kind="stable").index.to_numpy()
+    assert sort_positions(values, ascending).tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize("limit", [1, 2, 10, 100, 450, 1000])
+@pytest.mark.parametrize("ascending", [True, False])
+@pytest.mark.parametrize("column", COLUMNS)
+def test_top_k_is_the_head_of_a_stable_sort(column, ascending, limit):
+    df = pd.DataFrame(COLUMNS)
+    expected = df.sort_values(column, ascending=ascending, kind="stable").head(limit)
+    pd.testing.assert_frame_equal(search.top_k(df, column, ascending, limit), expected)
+
+
+@pytest.fixture(scope="module")
+def layouts(tmp_path_factory):
+    reports = generate(str(tmp_path_factory.mktemp("reports")), months=6, orders_per_month=100)
+    frames = [search.read_report(report) for report in reports]
+    products, _ = join_partitions(split_orders(frame) for frame in frames)
+    return {"default": pd.concat(frames, ignore_index=True), "compact": products}
+
+
+@pytest.mark.parametrize("limit", [1, 25, 1000])
+@pytest.mark.parametrize("ascending", [True, False])
+@pytest.mark.parametrize("column", [total_price_column, "Price", quantity_column, product_name_column, set_name_column, date_of_purchase_column])
+@pytest.mark.parametrize("layout", ["default", "compact"])
+def test_top_k_on_reports(layouts, layout, column, ascending, limit):
+    df = layouts[layout]
+    expected = df.sort_values(column, ascending=ascending, kind="stable").head(limit)
+    pd.testing.assert_frame_equal(search.top_k(df, column, ascending, limit), expected)
@@ -0,0 +1,130 @@
+import pytest
+from src.throttle import MAX_BACKOFF, MAX_RETRIES, RateController, TokenBucket
+
+
+class FakeClock:
+    """
+    A monotonic clock that only moves when something sleeps on it.
+    """
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def controller(clock, **kwargs):
+    return RateController(jitter=0, clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def responses(*items):
+    """
+    A send function answering with items in turn.
+    """
+    queue = list(items)
+    return lambda *args, **kwargs: queue.pop(0)
+
+
+def test_token_bucket_spaces_requests_at_the_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=0.5, clock=clock, sleep=clock.sleep)
+    starts = []
+    for _ in range(4):
+        bucket.acquire()
+        starts.append(clock.now)
+    # The first token is there, every later one takes 1 / rate seconds
+    assert starts == [0.0, 2.0, 4.0, 6.0]
+
+
+def test_token_bucket_refills_while_idle():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=0.5, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    clock.now += 10
+    assert bucket.acquire() == 0.0
+    assert clock.sleeps == []
+
+
+def test_token_bucket_rejects_a_zero_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_controller_paces_at_requests_per_minute():
+    clock = FakeClock()
+    rate = controller(clock, rate=6.0)
+    send = responses(*[FakeResponse() for _ in range(3)])
+    for _ in range(3):
+        rate.request(send)
+    assert clock.now == pytest.approx(20.0)
+
+
+def test_retry_after_is_honoured():
+    clock = FakeClock()
+    rate = controller(clock, rate=600.0)
+    response = rate.request(responses(FakeResponse(429, {"Retry-After": "42"}), FakeResponse(200)))
+    assert response.status_code == 200
+    # The retry waited the 42 s the server asked for, not the backoff
+    assert 42.0 in clock.sleeps
+    assert clock.now == pytest.approx(42.0, abs=0.2)
+
+
+def test_backoff_doubles_and_is_capped():
+    clock = FakeClock()
+    rate = controller(clock, rate=600.0, base_backoff=100.0)
+    before = clock.now
+    waits = []
+    for _ in range(5):
+        rate.record(FakeResponse(503))
+        waits.append(rate.blocked_until - before)
+        clock.now = before = rate.blocked_until
+    assert waits == [100.0, 200.0, 400.0, MAX_BACKOFF, MAX_BACKOFF]
+
+
+def test_healthy_responses_lower_the_backoff_again():
+    clock = FakeClock()
+    rate = controller(clock, base_backoff=10.0)
+    rate.record(FakeResponse(429))
+    rate.record(FakeResponse(429))
+    rate.record(FakeResponse(200))
+    clock.now = rate.blocked_until
+    rate.record(FakeResponse(429))
+    assert rate.blocked_until - clock.now == 20.0
+
+
+def test_gives_up_after_max_retries():
+    clock = FakeClock()
+    rate = controller(clock, rate=600.0, base_backoff=1.0)
+    attempts = [FakeResponse(429) for _ in range(MAX_RETRIES + 2)]
+    response = rate.request(responses(*attempts))
+    # The first attempt and MAX_RETRIES retries, the last throttled response goes back to the caller
+    assert response is attempts[MAX_RETRIES]
+    assert not response.closed
+    assert all(attempt.closed for attempt in attempts[:MAX_RETRIES])
+    assert rate.counters["requests"] == MAX_RETRIES + 1
+
+
+def test_summary_reports_the_counters():
+    clock = FakeClock()
+    rate = controller(clock, rate=600.0, base_backoff=1.0)
+    rate.request(responses(FakeResponse(429), FakeResponse(503), FakeResponse(200)))
+    rate.request(responses(FakeResponse(200)))
+    assert rate.counters["throttled"] == 2
+    assert rate.counters["retries"] == 2
+    assert rate.summary().startswith("4 requests, 2 throttled, 2 retried, ")